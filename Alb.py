@@ -22,31 +22,15 @@ from botocore.exceptions import ClientError, BotoCoreError
 
 
 
-import boto3
-import time
-import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from botocore.exceptions import ClientError
+from aws.client_pool import get_client
 
-MAX_WORKERS = 5  # Keep this low to avoid throttling
-RETRY_LIMIT = 5
-
-def describe_target_health_with_backoff(client, tg_arn):
-    retry = 0
-    while retry < RETRY_LIMIT:
-        try:
-            return client.describe_target_health(TargetGroupArn=tg_arn)
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'Throttling':
-                wait_time = 2 ** retry + random.uniform(0, 1)
-                time.sleep(wait_time)
-                retry += 1
-            else:
-                raise e
-    raise Exception(f"Max retries exceeded for {tg_arn}")
+# In-flight describe_target_health calls are capped by the throttle governor,
+# which backs off on Throttling and ramps up again on success
+MAX_WORKERS = 20
 
 def get_target_groups_with_many_ports(region_name: str, port_threshold: int = 5):
-    elbv2 = boto3.client('elbv2', region_name=region_name)
+    elbv2 = get_client('elbv2', region_name, max_workers=MAX_WORKERS)
 
     paginator = elbv2.get_paginator('describe_target_groups')
     response_iterator = paginator.paginate()
@@ -67,7 +51,7 @@ def get_target_groups_with_many_ports(region_name: str, port_threshold: int = 5)
         tg_arn = tg['TargetGroupArn']
         tg_name = tg['TargetGroupName']
         try:
-            health_response = describe_target_health_with_backoff(elbv2, tg_arn)
+            health_response = elbv2.describe_target_health(TargetGroupArn=tg_arn)
             instance_ports_map = {}
 
             for description in health_response['TargetHealthDescriptions']:
@@ -121,121 +105,12 @@ def get_target_groups_with_many_ports(region_name: str, port_threshold: int = 5)
 
 
 
-import boto3
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-def get_target_groups_with_many_ports(region_name: str, port_threshold: int = 5):
-    elbv2 = boto3.client('elbv2', region_name=region_name)
-
-    paginator = elbv2.get_paginator('describe_target_groups')
-    response_iterator = paginator.paginate()
-
-    all_target_groups = []
-
-    for page in response_iterator:
-        for tg in page['TargetGroups']:
-            if tg.get('TargetType') == 'instance':
-                all_target_groups.append({
-                    'TargetGroupArn': tg['TargetGroupArn'],
-                    'TargetGroupName': tg['TargetGroupName']
-                })
-
-    results = []
-
-    def process_target_group(tg):
-        tg_arn = tg['TargetGroupArn']
-        tg_name = tg['TargetGroupName']
-        try:
-            health_response = elbv2.describe_target_health(TargetGroupArn=tg_arn)
-            instance_ports_map = {}
-
-            for description in health_response['TargetHealthDescriptions']:
-                target = description['Target']
-                instance_id = target.get('Id')
-                port = target.get('Port')
-
-                if instance_id not in instance_ports_map:
-                    instance_ports_map[instance_id] = set()
-                instance_ports_map[instance_id].add(port)
-
-            group_results = []
-            for instance_id, ports in instance_ports_map.items():
-                if len(ports) >= port_threshold:
-                    group_results.append({
-                        "target_group_name": tg_name,
-                        "region": region_name,
-                        "instance_id": instance_id,
-                        "num_ports": len(ports),
-                        "ports": sorted(list(ports))
-                    })
-            return group_results
-        except Exception as e:
-            # Optionally log the error
-            return []
-
-    with ThreadPoolExecutor(max_workers=15) as executor:
-        future_to_tg = {executor.submit(process_target_group, tg): tg for tg in all_target_groups}
-        for future in as_completed(future_to_tg):
-            result = future.result()
-            if result:
-                results.extend(result)
-
-    return results
-
-
-
-
-
-
-
-
-
-
-
-
-import boto3
+from aws.elb_topology import get_topology
 
 def get_target_groups_with_many_ports(region_name: str, port_threshold: int = 5):
-    elbv2 = boto3.client('elbv2', region_name=region_name)
-    ec2 = boto3.client('ec2', region_name=region_name)
-
-    paginator = elbv2.get_paginator('describe_target_groups')
-    response_iterator = paginator.paginate()
-
-    results = []
-
-    for page in response_iterator:
-        for tg in page['TargetGroups']:
-            tg_arn = tg['TargetGroupArn']
-            tg_name = tg['TargetGroupName']
-            target_type = tg.get('TargetType')
-
-            if target_type != 'instance':
-                continue
-
-            health_response = elbv2.describe_target_health(TargetGroupArn=tg_arn)
-
-            instance_ports_map = {}
-            for description in health_response['TargetHealthDescriptions']:
-                target = description['Target']
-                instance_id = target.get('Id')
-                port = target.get('Port')
-
-                if instance_id not in instance_ports_map:
-                    instance_ports_map[instance_id] = set()
-                instance_ports_map[instance_id].add(port)
-
-            for instance_id, ports in instance_ports_map.items():
-                if len(ports) >= port_threshold:
-                    results.append({
-                        "target_group_name": tg_name,
-                        "region": region_name,
-                        "instance_id": instance_id,
-                        "num_ports": len(ports),
-                        "ports": sorted(list(ports))
-                    })
-
-    return results
+    # Instances registered on at least port_threshold ports of an instance
+    # target group, from the shared load balancer topology
+    return get_topology(region_name).instances_with_many_ports(port_threshold, region_name)
 
 
 
@@ -244,10 +119,18 @@ def get_target_groups_with_many_ports(region_name: str, port_threshold: int = 5)
 
 
 from fastapi import FastAPI, Query
+from prometheus_client import make_asgi_app
 from typing import List
 from aws_elb import get_target_groups_with_many_ports
+from aws.snapshot import snapshots
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+# The load balancer topology behind the report is refreshed in the background
+@app.on_event("startup")
+def start_snapshots():
+    snapshots.start()
 
 @app.get("/target-groups", summary="Get target groups with >=5 ports per instance")
 def list_target_groups(
@@ -272,58 +155,50 @@ def list_target_groups(
 
 
 
-def delete_ebs_volumes(volume_ids: list):
-    ec2 = boto3.client('ec2')
-    results = {}
+from aws.volume_deletion import VolumeDeletionJob
 
-    for vol_id in volume_ids:
-        try:
-            ec2.delete_volume(VolumeId=vol_id)
-            results[vol_id] = {"status": "success", "message": "Volume deleted successfully"}
-        except ClientError as e:
-            results[vol_id] = {
-                "status": "failed",
-                "message": e.response['Error']['Message'],
-                "code": e.response['Error']['Code']
-            }
-        except BotoCoreError as e:
-            results[vol_id] = {
-                "status": "failed",
-                "message": str(e),
-                "code": "BotoCoreError"
-            }
-        except Exception as e:
-            results[vol_id] = {
-                "status": "failed",
-                "message": str(e),
-                "code": "UnknownError"
-            }
-    return results
+def delete_ebs_volumes(volume_ids: list):
+    # Validates the whole batch with DryRun first, then deletes the valid
+    # volumes concurrently; results keep the old success / failed shape
+    job = VolumeDeletionJob(volume_ids).run()
+    return job.legacy_results()
 
 from fastapi import FastAPI, HTTPException
+from prometheus_client import make_asgi_app
 from pydantic import BaseModel
 from typing import List
-from aws.aws_methods import delete_ebs_volumes
+from aws.volume_deletion import get_deletion_progress, start_deletion_job
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 class VolumeDeleteRequest(BaseModel):
     volume_ids: List[str]
+    abort_on_invalid: bool = False
 
-@app.post("/delete_volumes")
+# Deletion runs as a background job so large batches don't hold the request
+# open, and a client that disconnects doesn't stop it halfway
+@app.post("/delete_volumes", status_code=202)
 def delete_volumes(request: VolumeDeleteRequest):
     if not request.volume_ids:
         raise HTTPException(status_code=400, detail="No volume IDs provided")
     
     try:
-        result = delete_ebs_volumes(request.volume_ids)
+        job = start_deletion_job(request.volume_ids, abort_on_invalid=request.abort_on_invalid)
         return {
+            "job_id": job.job_id,
             "requested_volumes": request.volume_ids,
-            "results": result
+            "status_url": f"/delete_volumes/{job.job_id}"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/delete_volumes/{job_id}")
+def delete_volumes_progress(job_id: str):
+    progress = get_deletion_progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail=f"Unknown deletion job: {job_id}")
+    return progress
 
 
 
@@ -238,28 +238,32 @@ def get_eks_clusters_count_by_vsad():
 from fastapi import FastAPI
 import boto3
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from prometheus_client import make_asgi_app
+from aws.dispatch import run_blocking
+from aws.metrics import attach_metrics
 import os
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Configure AWS credentials (can also be done via environment variables or AWS config file)
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = os.getenv('AWS_REGION', 'us-west-2')  # Set your default region
 
-# Create a boto3 EC2 client
-ec2_client = boto3.client(
+# Create a boto3 EC2 client; its calls are recorded in /metrics
+ec2_client = attach_metrics(boto3.client(
     'ec2',
     aws_access_key_id=AWS_ACCESS_KEY_ID,
     aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
     region_name=AWS_REGION
-)
+))
 
 @app.get("/ec2-instance-count")
 async def get_ec2_instance_count():
     try:
-        # Describe EC2 instances
-        response = ec2_client.describe_instances()
+        # Describe EC2 instances on a worker thread so the event loop stays free
+        response = await run_blocking('ec2-instance-count', ec2_client.describe_instances)
         instances = response['Reservations']
         
         # Count the instances
@@ -326,10 +330,20 @@ def get_elasticache_clusters_count_by_vsad():
 
 
 
-from fastapi import FastAPI
-from aws.aws_methods import get_ebs_volumes_count, get_snapshots_count
+from fastapi import FastAPI, Response
+from prometheus_client import make_asgi_app
+from aws.aws_methods import get_ebs_volumes_count
+from aws.client_pool import AWS_REGION
+from aws.ebs_snapshots import count_snapshots
+from aws.snapshot import snapshots, snapshot_response
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+# The EBS snapshot inventory is served from a per-region snapshot refreshed in the background
+@app.on_event("startup")
+def start_snapshots():
+    snapshots.start()
 
 @app.get("/ebs_volumes_count")
 def ebs_volumes_count():
@@ -338,15 +352,26 @@ def ebs_volumes_count():
 
 @app.get("/snapshots_count")
 def snapshots_count():
-    count = get_snapshots_count()
+    count = count_snapshots()
     return {"Snapshots Count": count}
 
+@app.get("/snapshots_by_vsad")
+def snapshots_by_vsad(response: Response, region: str = AWS_REGION):
+    return snapshot_response(response, 'ebs-snapshots', region).summary()
+
+@app.get("/orphaned_snapshots")
+def orphaned_snapshots(response: Response, region: str = AWS_REGION):
+    # Snapshots whose source volume no longer exists
+    inventory = snapshot_response(response, 'ebs-snapshots', region)
+    return {"Orphaned Snapshots Count": len(inventory.orphans), "Snapshots": inventory.orphan_rows()}
+
 
 
 
 
 import boto3
 from datetime import datetime
+from aws.ebs_snapshots import count_snapshots
 
 def get_msk_details(region: str, environment: str):
     # Initialize Boto3 client for MSK
@@ -404,21 +429,23 @@ def get_msk_details(region: str, environment: str):
     vsad_list = [details for vsad, details in vsad_data.items()]
     return vsad_list
 
-    ec2 = boto3.client('ec2')
-    response = ec2.describe_snapshots(OwnerIds=['self'])  # 'self' refers to your account
-    return len(response['Snapshots'])
+def get_snapshots_count():
+    # Paginated count of the account's own snapshots; pages are not kept
+    return count_snapshots()
 
 
 
 
 from fastapi import FastAPI, HTTPException
+from prometheus_client import make_asgi_app
 from typing import List, Dict, Any, Optional
-import boto3
 from botocore.exceptions import ClientError
+from aws.client_pool import get_client
 from pydantic import BaseModel
 from datetime import datetime
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Define a request model for API calls
 class RDSRequest(BaseModel):
@@ -433,7 +460,7 @@ def extract_owner(tag_list: List[Dict[str, str]]) -> str:
 
 # Function to fetch RDS Clusters using paginator
 def fetch_rds_clusters(region: str) -> List[Dict[str, Any]]:
-    client = boto3.client('rds', region_name=region)
+    client = get_client('rds', region)
 
     clusters = []
     paginator = client.get_paginator('describe_db_clusters')
@@ -469,7 +496,7 @@ def fetch_rds_clusters(region: str) -> List[Dict[str, Any]]:
 
 # Function to fetch RDS Instances using paginator
 def fetch_rds_instances(region: str) -> List[Dict[str, Any]]:
-    client = boto3.client('rds', region_name=region)
+    client = get_client('rds', region)
 
     instances = []
     paginator = client.get_paginator('describe_db_instances')
@@ -530,14 +557,17 @@ async def get_rds_instances(request: RDSRequest):
 
 
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from prometheus_client import make_asgi_app
 from typing import List, Dict, Any, Optional
-import boto3
 from botocore.exceptions import ClientError
+from aws.client_pool import get_client
+from aws.snapshot import snapshots, snapshot_response
 from pydantic import BaseModel
 from datetime import datetime
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Define a request model for API calls
 class RDSRequest(BaseModel):
@@ -552,7 +582,7 @@ def extract_tag_value(tag_list: List[Dict[str, str]], key: str) -> str:
 
 # Fetch RDS Clusters and Instances grouped by VSAD
 def fetch_rds_clusters_and_instances_by_vsad(region: str) -> List[Dict[str, Any]]:
-    client = boto3.client('rds', region_name=region)
+    client = get_client('rds', region)
     clusters_by_vsad = {}
     
     # Describe RDS Clusters
@@ -598,10 +628,17 @@ def fetch_rds_clusters_and_instances_by_vsad(region: str) -> List[Dict[str, Any]
 
     return output
 
+# Served from a per-region snapshot refreshed in the background
+snapshots.register('rds-clusters-and-instances', fetch_rds_clusters_and_instances_by_vsad)
+
+@app.on_event("startup")
+def start_snapshots():
+    snapshots.start()
+
 @app.post("/rds/clusters-and-instances")
-async def get_rds_clusters_and_instances_by_vsad(request: RDSRequest):
+def get_rds_clusters_and_instances_by_vsad(request: RDSRequest, response: Response):
     try:
-        clusters_and_instances_by_vsad = fetch_rds_clusters_and_instances_by_vsad(request.region)
+        clusters_and_instances_by_vsad = snapshot_response(response, 'rds-clusters-and-instances', request.region)
         if not clusters_and_instances_by_vsad:
             return {"message": "No clusters or instances found for the specified region."}
 
@@ -620,13 +657,15 @@ async def get_rds_clusters_and_instances_by_vsad(request: RDSRequest):
 
 
 from fastapi import FastAPI, HTTPException
+from prometheus_client import make_asgi_app
 from typing import List, Dict, Any
-import boto3
 from botocore.exceptions import ClientError
+from aws.client_pool import get_client
 from pydantic import BaseModel
 from datetime import datetime
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Define a request model for API calls
 class RDSRequest(BaseModel):
@@ -641,7 +680,7 @@ def extract_tag_value(tag_list: List[Dict[str, str]], key: str) -> str:
 
 # Fetch RDS Clusters grouped by VSAD
 def fetch_rds_clusters_by_vsad(region: str) -> List[Dict[str, Any]]:
-    client = boto3.client('rds', region_name=region)
+    client = get_client('rds', region)
     clusters_by_vsad = {}
 
     # Describe RDS Clusters
@@ -667,7 +706,7 @@ def fetch_rds_clusters_by_vsad(region: str) -> List[Dict[str, Any]]:
 
 # Fetch RDS Instances grouped by VSAD
 def fetch_rds_instances_by_vsad(region: str) -> List[Dict[str, Any]]:
-    client = boto3.client('rds', region_name=region)
+    client = get_client('rds', region)
     instances_by_vsad = {}
 
     # Describe RDS Instances
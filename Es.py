@@ -12,6 +12,7 @@ Here is the complete code with all the endpoints integrated:
 
 ```python
 from fastapi import FastAPI, HTTPException
+from prometheus_client import make_asgi_app
 from typing import List, Dict, Any
 import boto3
 from botocore.exceptions import ClientError
@@ -19,6 +20,7 @@ from pydantic import BaseModel
 from datetime import datetime
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Define a request model for API calls
 class AWSRequest(BaseModel):
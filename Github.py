@@ -1,9 +1,10 @@
 import boto3
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from aws.client_pool import get_client
+from aws.target_groups import describe_all_load_balancers
 
 # Initialize clients
-elbv2_client = boto3.client('elbv2')
 cloudwatch_client = boto3.client('cloudwatch')
 
 # Time range - last 1 day
@@ -35,11 +36,9 @@ def get_peak_lcu(lb_arn, lb_name):
 def fetch_all_peak_lcus():
     results = []
 
-    # Step 1: Get all load balancers
-    lbs = []
-    paginator = elbv2_client.get_paginator('describe_load_balancers')
-    for page in paginator.paginate():
-        lbs.extend(page['LoadBalancers'])
+    # Step 1: Get all ALBs (ConsumedLCUs is an AWS/ApplicationELB metric) from
+    # one paginated describe_load_balancers sweep
+    lbs = [lb for lb in describe_all_load_balancers(get_client('elbv2')) if lb['Type'] == 'application']
 
     print(f"Found {len(lbs)} load balancers.")
 
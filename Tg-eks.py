@@ -1,65 +1,39 @@
-import boto3
 from botocore.exceptions import ClientError
+from aws.client_pool import get_client
+from aws.elbv2_tags import describe_tags_bulk, tag_value
+from aws.target_groups import find_unattached_target_groups
 
 def get_unattached_eks_target_groups():
-    # Initialize AWS Boto3 client
-    elbv2_client = boto3.client('elbv2')
+    # Shared AWS Boto3 client
+    elbv2_client = get_client('elbv2')
 
-    paginator = elbv2_client.get_paginator('describe_target_groups')
-    
-    unattached_eks_target_groups = []
-
-    # Paginate through all target groups
     try:
-        for page in paginator.paginate():
-            target_groups = page['TargetGroups']
-
-            # Loop through each target group
-            for tg in target_groups:
-                tg_arn = tg['TargetGroupArn']
-                tg_name = tg['TargetGroupName']
-                
-                # Check if the target group is related to EKS
-                if "eks" in tg_name.lower():
-                    try:
-                        # Check if the target group has any targets registered
-                        targets = elbv2_client.describe_target_health(TargetGroupArn=tg_arn)['TargetHealthDescriptions']
-
-                        # If no targets are registered, add to unattached_target_groups list
-                        if not targets:
-                            unattached_eks_target_groups.append(tg_arn)
-
-                    except ClientError as e:
-                        # Handle specific target group not found error or any other client errors
-                        error_code = e.response['Error']['Code']
-                        if error_code == 'TargetGroupNotFound':
-                            print(f"Target Group not found: {tg_arn}, continuing to next target group...")
-                        else:
-                            print(f"Unexpected error occurred while checking target health: {str(e)}")
-                        continue  # Continue the loop to process the next target group
+        # EKS target groups no load balancer uses; only the ARNs are
+        # reported, so their registered targets are not counted
+        unattached_eks_target_groups = [
+            tg['TargetGroupArn']
+            for tg in find_unattached_target_groups(
+                elbv2_client,
+                name_filter=lambda tg: "eks" in tg['TargetGroupName'].lower(),
+                check_targets=False
+            )
+        ]
     except ClientError as e:
         print(f"Failed to describe target groups: {str(e)}")
         return []
 
     result = []
 
-    # Find the tags for each unattached target group
+    # Tags for all unattached target groups, 20 ARNs per call
+    tags_by_arn = describe_tags_bulk(unattached_eks_target_groups, elbv2_client)
     for tg_arn in unattached_eks_target_groups:
-        try:
-            # Get tags for the target group
-            tags_response = elbv2_client.describe_tags(ResourceArns=[tg_arn])
-            tags = tags_response['TagDescriptions'][0]['Tags']
-
-            # Extract the owner and user ID from the tags
-            owner = next((tag['Value'] for tag in tags if tag['Key'] == 'Owner'), 'Unknown')
-            user = next((tag['Value'] for tag in tags if tag['Key'] == 'User'), 'Unknown')
+        tags = tags_by_arn.get(tg_arn, [])
 
-            result.append({"TargetGroupArn": tg_arn, "Owner": owner, "User": user})
+        # Extract the owner and user ID from the tags
+        owner = tag_value(tags, 'Owner', 'Unknown')
+        user = tag_value(tags, 'User', 'Unknown')
 
-        except ClientError as e:
-            # Handle errors in fetching tags
-            print(f"Error fetching tags for {tg_arn}: {str(e)}")
-            result.append({"TargetGroupArn": tg_arn, "Owner": "Unknown", "User": "Unknown"})
+        result.append({"TargetGroupArn": tg_arn, "Owner": owner, "User": user})
 
     return result
 
@@ -81,47 +55,35 @@ if __name__ == "__main__":
 
 
 
-import boto3
+import argparse
 
-# Initialize the EC2 client
-ec2 = boto3.client('ec2')
+from aws.client_pool import AWS_REGION, get_client
+from aws.delete_on_termination import RemediationProgress, remediate_delete_on_termination
 
-# Function to check and update DeleteOnTermination attribute for attached volumes
-def update_delete_on_termination(instance_id):
-    try:
-        # Describe instance to get the attached volumes
-        response = ec2.describe_instances(InstanceIds=[instance_id])
-        instance = response['Reservations'][0]['Instances'][0]
-        
-        # Iterate over the block device mappings (attached volumes)
-        for block_device in instance.get('BlockDeviceMappings', []):
-            volume_id = block_device['Ebs']['VolumeId']
-            delete_on_termination = block_device['Ebs'].get('DeleteOnTermination', False)
-            
-            # If DeleteOnTermination is not set to True, update it
-            if not delete_on_termination:
-                print(f"Updating DeleteOnTermination for volume: {volume_id}")
-                
-                # Modify the attribute for the volume to enable DeleteOnTermination
-                ec2.modify_instance_attribute(
-                    InstanceId=instance_id,
-                    BlockDeviceMappings=[
-                        {
-                            'DeviceName': block_device['DeviceName'],
-                            'Ebs': {
-                                'DeleteOnTermination': True
-                            }
-                        }
-                    ]
-                )
-            else:
-                print(f"DeleteOnTermination is already set to True for volume: {volume_id}")
-    
-    except Exception as e:
-        print(f"Error: {str(e)}")
-
-# Replace with your EC2 instance ID
-instance_id = 'i-xxxxxxxxxxxxxx'
-
-# Update DeleteOnTermination attribute if not set
-update_delete_on_termination(instance_id)
+# Update DeleteOnTermination across every running instance, including root
+# volumes. Only lists the changes unless --apply is given.
+def main():
+    parser = argparse.ArgumentParser(description="Enable DeleteOnTermination on attached EBS volumes")
+    parser.add_argument('--region', default=AWS_REGION, help='AWS region')
+    parser.add_argument('--apply', action='store_true', help='Apply the changes (default: dry run)')
+    parser.add_argument('--skip-root', action='store_true', help='Leave root volumes unchanged')
+    parser.add_argument('--require-vsad', action='store_true', help='Only update instances with a VSAD tag')
+    parser.add_argument('--resume', action='store_true', help='Continue the last interrupted run')
+    args = parser.parse_args()
+
+    ec2 = get_client('ec2', args.region)
+    counts = remediate_delete_on_termination(
+        ec2,
+        progress=RemediationProgress(),
+        dry_run=not args.apply,
+        resume=args.resume,
+        include_root=not args.skip_root,
+        require_vsad=args.require_vsad
+    )
+    print(f"Fixed: {counts['fixed']}, failed: {counts['failed']}, already fixed: {counts['skipped']}, "
+          f"pending: {counts['pending']}")
+    if not args.apply:
+        print("Dry run only; re-run with --apply to update the instances")
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,22 @@
 #!/usr/bin/env python3
 
-import boto3
 import csv
-import time
-import random
+import json
+import os
 import argparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from botocore.exceptions import ClientError
+from aws.client_pool import get_client
+from aws.metrics import dump_metrics_at_exit
 
-MAX_WORKERS = 5
-RETRY_LIMIT = 5
-BATCH_SLEEP_SECONDS = 1  # wait after each batch
-
-def describe_target_health_with_backoff(client, tg_arn):
-    retry = 0
-    while retry < RETRY_LIMIT:
-        try:
-            return client.describe_target_health(TargetGroupArn=tg_arn)
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'Throttling':
-                wait = 2 ** retry + random.uniform(0, 1)
-                print(f"[WARN] Throttled. Retrying in {wait:.2f}s...")
-                time.sleep(wait)
-                retry += 1
-            else:
-                raise e
-    raise Exception(f"Max retries exceeded for {tg_arn}")
+# In-flight calls are paced by the per-operation throttle governor, so the
+# worker count only bounds how many target groups are queued at once
+MAX_WORKERS = 20
+# Processed target groups are recorded next to the report, e.g. report.csv.checkpoint
+CHECKPOINT_SUFFIX = '.checkpoint'
+FIELDNAMES = ['target_group_name', 'region', 'instance_id', 'num_ports', 'ports']
 
 def get_target_groups(region, prefix_filter=None):
-    elbv2 = boto3.client('elbv2', region_name=region)
+    elbv2 = get_client('elbv2', region)
     paginator = elbv2.get_paginator('describe_target_groups')
     iterator = paginator.paginate()
     
@@ -45,7 +33,7 @@ def get_target_groups(region, prefix_filter=None):
 
 def process_target_group(elbv2, tg, region, port_threshold):
     try:
-        health = describe_target_health_with_backoff(elbv2, tg['TargetGroupArn'])
+        health = elbv2.describe_target_health(TargetGroupArn=tg['TargetGroupArn'])
         instance_ports = {}
         for desc in health['TargetHealthDescriptions']:
             target = desc['Target']
@@ -66,33 +54,97 @@ def process_target_group(elbv2, tg, region, port_threshold):
         return rows
     except Exception as e:
         print(f"[ERROR] {tg['TargetGroupName']}: {str(e)}")
-        return []
+        # Not checkpointed, so --resume retries it
+        return None
 
-def generate_report(region, output_file, port_threshold=5, prefix_filter=None):
-    elbv2 = boto3.client('elbv2', region_name=region)
-    target_groups = get_target_groups(region, prefix_filter)
-    total = len(target_groups)
-    print(f"[INFO] Found {total} target groups. Processing...")
+# Function to load the processed target groups of an earlier run
+def load_checkpoint(checkpoint_file, settings):
+    """
+    Returns {target group ARN: name} from the checkpoint, or {} if there is
+    none or it was written with different report settings.
+    """
+    if not os.path.exists(checkpoint_file):
+        return {}
+    done = {}
+    with open(checkpoint_file) as f:
+        lines = f.read().splitlines()
+    if not lines or json.loads(lines[0]) != settings:
+        print(f"[INFO] {checkpoint_file} was written with different settings, starting from scratch")
+        return {}
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # Last line cut short by a crash
+            continue
+        done[entry['arn']] = entry['name']
+    return done
 
+# Function to keep only the report rows of finished target groups
+def rewrite_report(output_file, keep_names):
+    rows = []
+    if os.path.exists(output_file):
+        with open(output_file, newline='') as csvfile:
+            rows = [row for row in csv.DictReader(csvfile) if row['target_group_name'] in keep_names]
     with open(output_file, 'w', newline='') as csvfile:
-        fieldnames = ['target_group_name', 'region', 'instance_id', 'num_ports', 'ports']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
         writer.writeheader()
+        writer.writerows(rows)
 
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = []
-            for i, tg in enumerate(target_groups):
-                futures.append(executor.submit(process_target_group, elbv2, tg, region, port_threshold))
+def generate_report(region, output_file, port_threshold=5, prefix_filter=None, resume=False, since=False):
+    """
+    Writes the port report for every instance target group in the region.
 
-                # batching: pause every N submissions to avoid bursts
-                if i % (MAX_WORKERS * 5) == 0:
-                    time.sleep(BATCH_SLEEP_SECONDS)
+    Each finished target group is appended to a checkpoint file right after
+    its rows are flushed to the CSV. With resume, groups already in the
+    checkpoint are skipped; with since, groups whose ARNs are still present
+    are kept from the last run, groups that no longer exist are dropped and
+    only new ARNs are scanned.
+    """
+    elbv2 = get_client('elbv2', region, max_workers=MAX_WORKERS)
+    checkpoint_file = output_file + CHECKPOINT_SUFFIX
+    settings = {'region': region, 'ports': port_threshold, 'prefix': prefix_filter}
+    target_groups = get_target_groups(region, prefix_filter)
+
+    done = load_checkpoint(checkpoint_file, settings) if resume or since else {}
+    if since:
+        current = {tg['TargetGroupArn'] for tg in target_groups}
+        done = {arn: name for arn, name in done.items() if arn in current}
+    pending = [tg for tg in target_groups if tg['TargetGroupArn'] not in done]
+    print(f"[INFO] Found {len(target_groups)} target groups, {len(done)} already done. Processing {len(pending)}...")
+
+    # Start the report and checkpoint over from the groups that are kept
+    rewrite_report(output_file, set(done.values()))
+    with open(checkpoint_file, 'w') as checkpoint:
+        checkpoint.write(json.dumps(settings) + "\n")
+        for arn, name in done.items():
+            checkpoint.write(json.dumps({'arn': arn, 'name': name}) + "\n")
+
+    failed = 0
+    with open(output_file, 'a', newline='') as csvfile, open(checkpoint_file, 'a') as checkpoint:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(process_target_group, elbv2, tg, region, port_threshold): tg
+                for tg in pending
+            }
 
             for future in as_completed(futures):
+                tg = futures[future]
                 rows = future.result()
+                if rows is None:
+                    failed += 1
+                    continue
                 for row in rows:
                     writer.writerow(row)
+                # Rows first, then the checkpoint entry, so a checkpointed group is always in the report
+                csvfile.flush()
+                checkpoint.write(json.dumps({'arn': tg['TargetGroupArn'], 'name': tg['TargetGroupName']}) + "\n")
+                checkpoint.flush()
 
+    if failed:
+        print(f"[INFO] {failed} target groups failed; rerun with --resume to retry only those")
     print(f"[DONE] Report written to {output_file}")
 
 def main():
@@ -101,9 +153,13 @@ def main():
     parser.add_argument('--output', required=True, help='Output CSV file path')
     parser.add_argument('--ports', type=int, default=5, help='Minimum number of ports (default: 5)')
     parser.add_argument('--prefix', help='Optional target group name prefix filter')
+    parser.add_argument('--resume', action='store_true', help='Skip target groups finished by an interrupted run')
+    parser.add_argument('--since', action='store_true',
+                        help='Only scan target groups whose ARNs are new since the last run; drop ones that are gone')
 
     args = parser.parse_args()
-    generate_report(args.region, args.output, args.ports, args.prefix)
+    dump_metrics_at_exit()
+    generate_report(args.region, args.output, args.ports, args.prefix, args.resume, args.since)
 
 if __name__ == '__main__':
     main()
@@ -1,4 +1,6 @@
 import boto3
+from aws.elbv2_tags import describe_tags_bulk, tag_value
+from aws.target_groups import build_attachment_index
 
 def get_all_target_groups(client):
     """Retrieve all target groups in the specified region."""
@@ -10,39 +12,37 @@ def get_all_target_groups(client):
     
     return target_groups
 
-def is_target_group_used(client, target_group_arn):
-    """Check if the target group is associated with any load balancers."""
-    response = client.describe_target_group_attributes(
-        TargetGroupArn=target_group_arn
-    )
-    
-    return len(response.get('Attributes', [])) > 0
+def is_target_group_used(attachment_index, target_group_arn):
+    """Check if the target group is associated with any existing load balancer."""
+    return len(attachment_index.get(target_group_arn, [])) > 0
 
 def get_unused_target_groups(client):
     """Find unused target groups related to EKS."""
     unused_target_groups = []
-    target_groups = get_all_target_groups(client)
+    # One paginated sweep of target groups and load balancers
+    target_groups, attachment_index = build_attachment_index(client)
     
-    for tg in target_groups:
+    # Groups a load balancer uses need no tag lookup
+    candidates = [tg for tg in target_groups if not is_target_group_used(attachment_index, tg['TargetGroupArn'])]
+    tags_by_arn = describe_tags_bulk([tg['TargetGroupArn'] for tg in candidates], client)
+
+    for tg in candidates:
         tg_arn = tg['TargetGroupArn']
         tg_name = tg['TargetGroupName']
-        tags = client.describe_tags(
-            ResourceArns=[tg_arn]
-        ).get('TagDescriptions', [])
+        tags = tags_by_arn.get(tg_arn, [])
 
         # Check for EKS-related tags or naming conventions
         is_eks_target_group = any(
             tag['Key'].startswith('eks:') or 'eks' in tg_name.lower()
-            for tag in tags[0]['Tags']
+            for tag in tags
         )
 
         if is_eks_target_group:
-            if not is_target_group_used(client, tg_arn):
-                unused_target_groups.append({
-                    'TargetGroupArn': tg_arn,
-                    'TargetGroupName': tg_name,
-                    'OwnerId': tg['LoadBalancerArns'],
-                })
+            unused_target_groups.append({
+                'TargetGroupArn': tg_arn,
+                'TargetGroupName': tg_name,
+                'OwnerId': tag_value(tags, 'Owner', 'Unknown'),
+            })
 
     return unused_target_groups
 
@@ -103,64 +103,41 @@ else:
 
 
 from fastapi import FastAPI
-import boto3
+from prometheus_client import make_asgi_app
 from botocore.exceptions import ClientError
+from aws.client_pool import get_client
+from aws.elbv2_tags import describe_tags_bulk, tag_value
+from aws.target_groups import find_unattached_target_groups
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
-# Initialize AWS Boto3 client
-elbv2_client = boto3.client('elbv2')
+# Shared AWS Boto3 client
+elbv2_client = get_client('elbv2')
 
 @app.get("/unattached-target-groups")
 def get_unattached_target_groups():
     try:
-        # List all target groups
-        target_groups = elbv2_client.describe_target_groups()['TargetGroups']
+        # Target groups no load balancer uses, from the attachment index;
+        # only the ARNs are reported, so their registered targets are not counted
+        unattached_target_groups = [
+            tg['TargetGroupArn'] for tg in find_unattached_target_groups(elbv2_client, check_targets=False)
+        ]
     except ClientError as e:
         # Handle AWS client errors
         return {"error": f"Failed to describe target groups: {str(e)}"}
 
-    unattached_target_groups = []
-    
-    # Loop through each target group
-    for tg in target_groups:
-        tg_arn = tg['TargetGroupArn']
-        
-        try:
-            # Check if the target group has any targets registered
-            targets = elbv2_client.describe_target_health(TargetGroupArn=tg_arn)['TargetHealthDescriptions']
-            
-            # If no targets are registered, add to unattached_target_groups list
-            if not targets:
-                unattached_target_groups.append(tg_arn)
-        
-        except ClientError as e:
-            # Handle specific target group not found error or any other client errors
-            error_code = e.response['Error']['Code']
-            if error_code == 'TargetGroupNotFound':
-                print(f"Target Group not found: {tg_arn}, continuing to next target group...")
-            else:
-                print(f"Unexpected error occurred: {str(e)}")
-            continue  # Continue the loop to process next target group
-
     result = []
 
-    # Find the tags for each unattached target group
+    # Tags for all unattached target groups, 20 ARNs per call
+    tags_by_arn = describe_tags_bulk(unattached_target_groups, elbv2_client)
     for tg_arn in unattached_target_groups:
-        try:
-            # Get tags for the target group
-            tags_response = elbv2_client.describe_tags(ResourceArns=[tg_arn])
-            tags = tags_response['TagDescriptions'][0]['Tags']
-            
-            # Extract the owner and user ID from the tags
-            owner = next((tag['Value'] for tag in tags if tag['Key'] == 'Owner'), 'Unknown')
-            user = next((tag['Value'] for tag in tags if tag['Key'] == 'User'), 'Unknown')
-            
-            result.append({"TargetGroupArn": tg_arn, "Owner": owner, "User": user})
-        
-        except ClientError as e:
-            # Handle errors in fetching tags
-            print(f"Error fetching tags for {tg_arn}: {str(e)}")
-            result.append({"TargetGroupArn": tg_arn, "Owner": "Unknown", "User": "Unknown"})
-    
+        tags = tags_by_arn.get(tg_arn, [])
+
+        # Extract the owner and user ID from the tags
+        owner = tag_value(tags, 'Owner', 'Unknown')
+        user = tag_value(tags, 'User', 'Unknown')
+
+        result.append({"TargetGroupArn": tg_arn, "Owner": owner, "User": user})
+
     return result
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Shared budget file. Every process on the host that points at the same file
+# draws from the same per-API token buckets (for k8s pods, mount a hostPath
+# here). Set AWS_API_BUDGET_DB to an empty string to disable the budget.
+AWS_API_BUDGET_DB = os.getenv('AWS_API_BUDGET_DB', '/tmp/aws_api_budget.db')
+
+# Requests per second and burst size per (service, operation); everything
+# else uses the defaults. Keep these a little under the documented account
+# limits so that callers outside this host still have room.
+DEFAULT_RATE = 20
+DEFAULT_BURST = 40
+API_RATE_LIMITS = {
+    ('cloudtrail', 'LookupEvents'): (2, 2),
+    ('elbv2', 'DescribeTargetHealth'): (10, 20),
+    ('elbv2', 'DescribeTags'): (10, 20),
+    ('elasticache', 'ListTagsForResource'): (10, 20),
+    ('ec2', 'DescribeVolumes'): (20, 50),
+    ('ec2', 'DescribeInstances'): (20, 50),
+    ('cloudwatch', 'GetMetricStatistics'): (50, 100),
+}
+
+_local = threading.local()
+
+
+def _connect():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        # isolation_level=None lets us issue BEGIN IMMEDIATE ourselves, which
+        # takes the write lock up front so read-modify-write is atomic
+        # across processes.
+        conn = sqlite3.connect(AWS_API_BUDGET_DB, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        _local.conn = conn
+    return conn
+
+
+def _take_token(conn, key, rate, burst):
+    """
+    Takes one token from the bucket, returning 0 on success or the number of
+    seconds to wait before the next token is available.
+    """
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            tokens = burst
+        else:
+            tokens = min(burst, row[0] + max(0.0, now - row[1]) * rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0
+        else:
+            wait = (1 - tokens) / rate
+
+        conn.execute(
+            'INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+            (key, tokens, now)
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return wait
+
+
+def acquire(service, operation, region):
+    """
+    Blocks until the host-wide budget for this API allows one more request.
+    """
+    rate, burst = API_RATE_LIMITS.get((service, operation), (DEFAULT_RATE, DEFAULT_BURST))
+    conn = _connect()
+    key = f"{service}.{operation}.{region}"
+
+    while True:
+        wait = _take_token(conn, key, rate, burst)
+        if not wait:
+            return
+        time.sleep(wait)
+
+
+def attach_budget(client):
+    """
+    Charges every HTTP request the client sends, retries included, against
+    the shared host budget.
+    """
+    if not AWS_API_BUDGET_DB:
+        return client
+
+    service = client.meta.service_model.service_name
+    region = client.meta.region_name
+
+    def before_send(event_name, **kwargs):
+        acquire(service, event_name.rsplit('.', 1)[-1], region)
+
+    client.meta.events.register('before-send', before_send)
+    return client
@@ -0,0 +1,118 @@
+import asyncio
+from contextlib import AsyncExitStack
+
+from aiobotocore.session import get_session
+from botocore.config import Config
+
+from .metrics import attach_metrics
+
+# Signed requests allowed in flight at once on one event loop
+DEFAULT_CONCURRENCY = 500
+# How often run_until_disconnected checks whether the HTTP client went away
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class AsyncCollector:
+    """
+    Native asyncio AWS calls (aiobotocore) with bounded concurrency.
+
+    One collector owns one aiobotocore client per service for a region. Every
+    request, including each page of a paginator, holds a slot of a shared
+    asyncio.Semaphore, so thousands of describe/list-tags coroutines can be
+    queued while at most `concurrency` requests are on the wire. Throttling
+    is handled by botocore's adaptive retry mode, which rate-limits the
+    client itself when the service starts throttling.
+
+        async with AsyncCollector(region) as collector:
+            clusters = [c async for c in collector.paginate('elasticache', 'describe_cache_clusters', 'CacheClusters')]
+    """
+
+    def __init__(self, region, concurrency=DEFAULT_CONCURRENCY):
+        self.region = region
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._config = Config(
+            region_name=region,
+            retries={'max_attempts': 10, 'mode': 'adaptive'},
+            max_pool_connections=concurrency
+        )
+        self._session = get_session()
+        self._stack = AsyncExitStack()
+        self._clients = {}
+        self._clients_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self._stack.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._clients.clear()
+        return await self._stack.__aexit__(*exc_info)
+
+    async def client(self, service):
+        client = self._clients.get(service)
+        if client is None:
+            async with self._clients_lock:
+                client = self._clients.get(service)
+                if client is None:
+                    client = await self._stack.enter_async_context(
+                        self._session.create_client(service, region_name=self.region, config=self._config)
+                    )
+                    attach_metrics(client)
+                    self._clients[service] = client
+        return client
+
+    async def call(self, service, operation, **kwargs):
+        client = await self.client(service)
+        async with self._semaphore:
+            return await getattr(client, operation)(**kwargs)
+
+    async def paginate(self, service, operation, result_key, **kwargs):
+        """
+        Yields the items under result_key from every page, one request at a time.
+        """
+        client = await self.client(service)
+        pages = client.get_paginator(operation).paginate(**kwargs).__aiter__()
+        while True:
+            async with self._semaphore:
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    return
+            for item in page.get(result_key, []):
+                yield item
+
+    async def gather(self, coros):
+        """
+        Runs the coroutines concurrently and returns their results in order.
+        If the caller is cancelled, every outstanding task is cancelled too.
+        """
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+
+async def run_until_disconnected(request, coro):
+    """
+    Awaits coro on behalf of a FastAPI/Starlette request, cancelling it as soon
+    as the HTTP client disconnects so abandoned crawls stop issuing AWS calls.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
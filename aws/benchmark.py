@@ -0,0 +1,564 @@
+import argparse
+import ast
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from botocore.awsrequest import AWSResponse
+
+# Repository root, where the scripts under test live
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ACCOUNT_ID = '123456789012'
+
+# Default synthetic account size
+DEFAULT_SIZES = {
+    'volumes': 10000,
+    'target_groups': 5000,
+    'elasticache_clusters': 2000,
+    'rds_instances': 3000,
+}
+DEFAULT_THROTTLE_RATE = 0.02
+DEFAULT_LATENCY = 0.02  # seconds per simulated request
+
+VSADS = ['ABCD', 'EFGH', 'IJKL', 'MNOP', 'QRST']
+
+# Throttle error each protocol's services answer with
+THROTTLE_ERRORS = {
+    'ec2': ('RequestLimitExceeded', 503),
+    'query': ('Throttling', 400),
+    'json': ('ThrottlingException', 400),
+}
+
+
+def _tags(rng):
+    return [
+        {'Key': 'VSAD', 'Value': rng.choice(VSADS)},
+        {'Key': 'owner', 'Value': f"team-{rng.randint(1, 20)}"},
+    ]
+
+
+def _page(items, params, token_key, size_key, max_size):
+    """
+    One page of items for an AWS-style paginated call; tokens are offsets.
+    """
+    start = int(params.get(token_key) or 0)
+    size = min(params.get(size_key) or max_size, max_size)
+    end = start + size
+    return items[start:end], (str(end) if end < len(items) else None)
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class SyntheticAccount:
+    """
+    In-memory AWS account answering the read calls the inventory scripts make.
+
+    attach(client) installs it on a botocore client's before-send event, so
+    requests never leave the process but still go through botocore's retries
+    and every hook the client pool installs (throttle governor, API budget,
+    metrics). A configurable share of requests is answered with the
+    service's throttling error, and each request can be delayed to simulate
+    network latency.
+    """
+
+    def __init__(self, sizes=None, throttle_rate=DEFAULT_THROTTLE_RATE, latency=DEFAULT_LATENCY, seed=0):
+        sizes = dict(DEFAULT_SIZES, **(sizes or {}))
+        self.throttle_rate = throttle_rate
+        self.latency = latency
+        self.requests = 0
+        self.throttled = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._matches = {}
+        # Event times are relative to now, since the scripts look back from now
+        self._now = datetime.now(timezone.utc)
+        self._build_volumes(sizes['volumes'])
+        self._build_target_groups(sizes['target_groups'])
+        self._build_elasticache(sizes['elasticache_clusters'])
+        self._build_rds(sizes['rds_instances'])
+        self._handlers = {
+            ('ec2', 'DescribeVolumes'): self.describe_volumes,
+            ('cloudtrail', 'LookupEvents'): self.lookup_events,
+            ('elbv2', 'DescribeTargetGroups'): self.describe_target_groups,
+            ('elbv2', 'DescribeTargetHealth'): self.describe_target_health,
+            ('elasticache', 'DescribeCacheClusters'): self.describe_cache_clusters,
+            ('elasticache', 'ListTagsForResource'): self.list_tags_for_resource,
+            ('elasticache', 'DescribeReplicationGroups'): self.describe_replication_groups,
+            ('rds', 'DescribeDBClusters'): self.describe_db_clusters,
+            ('rds', 'DescribeDBInstances'): self.describe_db_instances,
+        }
+
+    # Account contents
+    def _build_volumes(self, count):
+        rng = self._rng
+        self.volumes = []
+        events = []
+        # `count` available volumes plus a quarter as many in use
+        for i in range(count + count // 4):
+            volume_id = f"vol-{i:017x}"
+            created = self._now - timedelta(days=rng.randint(1, 400), seconds=rng.randint(0, 86400))
+            available = i < count
+            self.volumes.append({
+                'VolumeId': volume_id,
+                'Size': rng.choice([8, 20, 50, 100, 500]),
+                'VolumeType': rng.choice(['gp2', 'gp3', 'io1', 'st1']),
+                'State': 'available' if available else 'in-use',
+                'AvailabilityZone': 'us-east-1a',
+                'CreateTime': created,
+                'Tags': _tags(rng),
+            })
+            resources = [{'ResourceType': 'AWS::EC2::Volume', 'ResourceName': volume_id}]
+            attached = created + timedelta(minutes=5)
+            events.append(('CreateVolume', created, resources))
+            events.append(('AttachVolume', attached, resources))
+            # Most available volumes were detached from an instance at some point
+            if available and rng.random() < 0.9:
+                detached = attached + (self._now - attached) * rng.random()
+                events.append(('DetachVolume', detached, resources))
+
+        events.sort(key=lambda event: event[1], reverse=True)
+        self.events = [
+            {
+                'EventId': f"{i:08x}-0000-0000-0000-000000000000",
+                'EventName': name,
+                'EventSource': 'ec2.amazonaws.com',
+                'EventTime': event_time,
+                'Username': 'benchmark',
+                'Resources': resources,
+            }
+            for i, (name, event_time, resources) in enumerate(events)
+        ]
+        self._events_by_name = {}
+        self._events_by_resource = {}
+        for event in self.events:
+            self._events_by_name.setdefault(event['EventName'], []).append(event)
+            for res in event['Resources']:
+                self._events_by_resource.setdefault(res['ResourceName'], []).append(event)
+
+    def _build_target_groups(self, count):
+        rng = self._rng
+        self.target_groups = []
+        self.target_health = {}
+        for i in range(count):
+            name = f"tg-{i:05d}"
+            arn = f"arn:aws:elasticloadbalancing:us-east-1:{ACCOUNT_ID}:targetgroup/{name}/{i:016x}"
+            self.target_groups.append({
+                'TargetGroupArn': arn,
+                'TargetGroupName': name,
+                'Protocol': 'HTTP',
+                'Port': 80,
+                'VpcId': 'vpc-00000000',
+                'TargetType': 'instance' if rng.random() < 0.9 else 'ip',
+            })
+            targets = []
+            for instance in range(rng.randint(0, 4)):
+                instance_id = f"i-{rng.getrandbits(64):017x}"
+                for port in rng.sample(range(8000, 8100), rng.randint(1, 8)):
+                    targets.append({
+                        'Target': {'Id': instance_id, 'Port': port},
+                        'HealthCheckPort': str(port),
+                        'TargetHealth': {'State': 'healthy'},
+                    })
+            self.target_health[arn] = targets
+
+    def _build_elasticache(self, count):
+        rng = self._rng
+        self.cache_clusters = []
+        self.cache_tags = {}
+        for i in range(count):
+            cluster_id = f"cache-{i:05d}"
+            arn = f"arn:aws:elasticache:us-east-1:{ACCOUNT_ID}:cluster:{cluster_id}"
+            self.cache_clusters.append({
+                'CacheClusterId': cluster_id,
+                'ARN': arn,
+                'Engine': rng.choice(['redis', 'memcached']),
+                'NumCacheNodes': rng.randint(1, 3),
+                'CacheNodeType': rng.choice(['cache.t3.micro', 'cache.r6g.large']),
+                'CacheClusterStatus': 'available',
+                'CacheClusterCreateTime': self._now - timedelta(days=rng.randint(1, 700)),
+            })
+            self.cache_tags[arn] = _tags(rng)
+        self.replication_groups = [
+            {
+                'ReplicationGroupId': f"rg-{i:05d}",
+                'Status': 'available',
+                'NodeGroups': [{'NodeGroupId': f"{n:04d}"} for n in range(rng.randint(1, 4))],
+            }
+            for i in range(count // 4)
+        ]
+
+    def _build_rds(self, count):
+        rng = self._rng
+        self.db_clusters = [
+            {
+                'DBClusterIdentifier': f"cluster-{i:05d}",
+                'DBClusterArn': f"arn:aws:rds:us-east-1:{ACCOUNT_ID}:cluster:cluster-{i:05d}",
+                'DBClusterInstanceClass': 'db.r6g.large',
+                'Engine': 'aurora-postgresql',
+                'ClusterCreateTime': self._now - timedelta(days=rng.randint(1, 700)),
+                'TagList': _tags(rng),
+            }
+            for i in range(count // 6)
+        ]
+        self.db_instances = [
+            {
+                'DBInstanceIdentifier': f"db-{i:05d}",
+                'DBInstanceArn': f"arn:aws:rds:us-east-1:{ACCOUNT_ID}:db:db-{i:05d}",
+                'DBInstanceClass': rng.choice(['db.t3.medium', 'db.r6g.large']),
+                'Engine': 'postgres',
+                'InstanceCreateTime': self._now - timedelta(days=rng.randint(1, 700)),
+                'TagList': _tags(rng),
+            }
+            for i in range(count)
+        ]
+
+    # API handlers: botocore-shaped output for the request parameters
+    def _matching(self, operation, params, token_key, select):
+        # Every page of a paginated call repeats the same filters; filter once
+        key = (operation, repr(sorted((k, v) for k, v in params.items() if k != token_key)))
+        items = self._matches.get(key)
+        if items is None:
+            if len(self._matches) > 64:
+                self._matches.clear()
+            items = self._matches[key] = select()
+        return items
+
+    def describe_volumes(self, params):
+        def select():
+            volumes = self.volumes
+            for f in params.get('Filters', []):
+                if f['Name'] == 'status':
+                    volumes = [v for v in volumes if v['State'] in f['Values']]
+                elif f['Name'] == 'volume-id':
+                    volumes = [v for v in volumes if v['VolumeId'] in f['Values']]
+            if params.get('VolumeIds'):
+                volumes = [v for v in volumes if v['VolumeId'] in params['VolumeIds']]
+            return volumes
+
+        volumes = self._matching('DescribeVolumes', params, 'NextToken', select)
+        page, token = _page(volumes, params, 'NextToken', 'MaxResults', max(len(volumes), 1))
+        return {'Volumes': page, 'NextToken': token}
+
+    def lookup_events(self, params):
+        def select():
+            events = self.events
+            for attribute in params.get('LookupAttributes', []):
+                if attribute['AttributeKey'] == 'EventName':
+                    events = self._events_by_name.get(attribute['AttributeValue'], [])
+                elif attribute['AttributeKey'] == 'ResourceName':
+                    events = self._events_by_resource.get(attribute['AttributeValue'], [])
+            if params.get('StartTime') or params.get('EndTime'):
+                start = _utc(params.get('StartTime') or datetime.min)
+                end = _utc(params.get('EndTime') or datetime.max)
+                events = [e for e in events if start <= e['EventTime'] <= end]
+            return events
+
+        events = self._matching('LookupEvents', params, 'NextToken', select)
+        page, token = _page(events, params, 'NextToken', 'MaxResults', 50)
+        return {'Events': page, 'NextToken': token}
+
+    def describe_target_groups(self, params):
+        page, token = _page(self.target_groups, params, 'Marker', 'PageSize', 400)
+        return {'TargetGroups': page, 'NextMarker': token}
+
+    def describe_target_health(self, params):
+        return {'TargetHealthDescriptions': self.target_health[params['TargetGroupArn']]}
+
+    def describe_cache_clusters(self, params):
+        page, token = _page(self.cache_clusters, params, 'Marker', 'MaxRecords', 100)
+        return {'CacheClusters': page, 'Marker': token}
+
+    def list_tags_for_resource(self, params):
+        return {'TagList': self.cache_tags[params['ResourceName']]}
+
+    def describe_replication_groups(self, params):
+        page, token = _page(self.replication_groups, params, 'Marker', 'MaxRecords', 100)
+        return {'ReplicationGroups': page, 'Marker': token}
+
+    def describe_db_clusters(self, params):
+        page, token = _page(self.db_clusters, params, 'Marker', 'MaxRecords', 100)
+        return {'DBClusters': page, 'Marker': token}
+
+    def describe_db_instances(self, params):
+        page, token = _page(self.db_instances, params, 'Marker', 'MaxRecords', 100)
+        return {'DBInstances': page, 'Marker': token}
+
+    # Wiring into botocore
+    def attach(self, client):
+        service_model = client.meta.service_model
+        service = service_model.service_name
+
+        def before_parameter_build(params, context, **kwargs):
+            context['benchmark_params'] = dict(params)
+
+        def before_send(request, event_name, **kwargs):
+            operation_model = service_model.operation_model(event_name.rsplit('.', 1)[-1])
+            with self._lock:
+                self.requests += 1
+                throttle = self._rng.random() < self.throttle_rate
+                if throttle:
+                    self.throttled += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if throttle:
+                code, status = THROTTLE_ERRORS[service_model.protocol]
+                return _error_response(request, service_model.protocol, code, status)
+            handler = self._handlers.get((service, operation_model.name))
+            if handler is None:
+                return _error_response(request, service_model.protocol, 'InvalidAction', 400)
+            output = handler(request.context.get('benchmark_params', {}))
+            return _response(request, operation_model, output)
+
+        client.meta.events.register('before-parameter-build', before_parameter_build)
+        client.meta.events.register('before-send', before_send)
+        return client
+
+
+# Wire-format responses so botocore parses them exactly as it would AWS's
+class _RawBody:
+    def __init__(self, body):
+        self._body = body
+
+    def stream(self, **kwargs):
+        yield self._body
+
+
+def _xml_scalar(shape, value):
+    if shape.type_name == 'timestamp':
+        return value.isoformat()
+    if shape.type_name == 'boolean':
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _xml_node(parent, tag, shape, value):
+    if shape.type_name == 'list':
+        member_tag = shape.member.serialization.get('name', 'member')
+        if shape.serialization.get('flattened'):
+            for item in value:
+                _xml_node(parent, member_tag, shape.member, item)
+        else:
+            node = ET.SubElement(parent, tag)
+            for item in value:
+                _xml_node(node, member_tag, shape.member, item)
+    elif shape.type_name == 'structure':
+        node = ET.SubElement(parent, tag)
+        _xml_members(node, shape, value)
+    elif shape.type_name == 'map':
+        node = ET.SubElement(parent, tag)
+        for key, item in value.items():
+            entry = ET.SubElement(node, 'entry')
+            _xml_node(entry, shape.key.serialization.get('name', 'key'), shape.key, key)
+            _xml_node(entry, shape.value.serialization.get('name', 'value'), shape.value, item)
+    else:
+        ET.SubElement(parent, tag).text = _xml_scalar(shape, value)
+
+
+def _xml_members(node, shape, value):
+    for name, member in shape.members.items():
+        if value.get(name) is not None:
+            _xml_node(node, member.serialization.get('name', name), member, value[name])
+
+
+def _json_value(shape, value):
+    if shape.type_name == 'structure':
+        return {
+            name: _json_value(member, value[name])
+            for name, member in shape.members.items() if value.get(name) is not None
+        }
+    if shape.type_name == 'list':
+        return [_json_value(shape.member, item) for item in value]
+    if shape.type_name == 'map':
+        return {key: _json_value(shape.value, item) for key, item in value.items()}
+    if shape.type_name == 'timestamp':
+        return value.timestamp()
+    return value
+
+
+def _response(request, operation_model, output):
+    protocol = operation_model.metadata['protocol']
+    shape = operation_model.output_shape
+    if protocol == 'json':
+        body = json.dumps(_json_value(shape, output)).encode()
+        headers = {'Content-Type': 'application/x-amz-json-1.1'}
+    else:
+        root = ET.Element(f"{operation_model.name}Response")
+        wrapper = shape.serialization.get('resultWrapper')
+        _xml_members(ET.SubElement(root, wrapper) if wrapper else root, shape, output)
+        body = ET.tostring(root)
+        headers = {'Content-Type': 'text/xml'}
+    return AWSResponse(request.url, 200, headers, _RawBody(body))
+
+
+def _error_response(request, protocol, code, status):
+    if protocol == 'json':
+        body = json.dumps({'__type': code, 'message': 'Rate exceeded'}).encode()
+    elif protocol == 'ec2':
+        body = (
+            f"<Response><Errors><Error><Code>{code}</Code><Message>Rate exceeded</Message></Error></Errors>"
+            f"<RequestID>benchmark</RequestID></Response>"
+        ).encode()
+    else:
+        body = (
+            f"<ErrorResponse><Error><Type>Sender</Type><Code>{code}</Code><Message>Rate exceeded</Message></Error>"
+            f"<RequestId>benchmark</RequestId></ErrorResponse>"
+        ).encode()
+    return AWSResponse(request.url, status, {}, _RawBody(body))
+
+
+# Loading functions out of the multi-snippet scripts
+def _is_snippet_start(lines, i):
+    """
+    A snippet starts at a top-level import that follows two blank lines.
+    """
+    if not lines[i].startswith(('import ', 'from ')):
+        return False
+    return i == 0 or (i >= 2 and not lines[i - 1].strip() and not lines[i - 2].strip())
+
+
+def _runs_code(node):
+    # Module-level calls such as `process_volumes()` and __main__ blocks
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+        return True
+    return isinstance(node, ast.If) and '__name__' in ast.unparse(node.test)
+
+
+def load_function(path, name):
+    """
+    Compiles the snippet of `path` that defines `name` on its own and returns
+    the function. Module-level calls in the snippet are skipped so loading
+    does not run the script.
+    """
+    with open(path) as f:
+        lines = f.read().splitlines()
+    def_line = next(i for i, line in enumerate(lines) if line.startswith(f"def {name}("))
+    start = next((i for i in range(def_line, -1, -1) if _is_snippet_start(lines, i)), 0)
+    end = next((i for i in range(def_line + 1, len(lines)) if _is_snippet_start(lines, i)), len(lines))
+
+    tree = ast.parse('\n'.join(lines[start:end]), filename=path)
+    tree.body = [node for node in tree.body if not _runs_code(node)]
+    ast.increment_lineno(tree, start)
+    namespace = {'__name__': f"benchmark.{name}", '__file__': path}
+    exec(compile(tree, path, 'exec'), namespace)
+    return namespace[name]
+
+
+# Benchmarks: (script, function, resources counted, call arguments)
+BENCHMARKS = {
+    'process_volumes': ('cache.py', 'process_volumes', 'volumes', lambda region, workdir: ()),
+    'collect_detach_times': (
+        'New.py', 'collect_detach_times', 'volumes',
+        lambda region, workdir: (region, 'benchmark')
+    ),
+    'generate_report': (
+        'Today.py', 'generate_report', 'target_groups',
+        lambda region, workdir: (region, os.path.join(workdir, 'report.csv'))
+    ),
+    'fetch_elasticache_clusters': (
+        'test.py', 'fetch_elasticache_clusters', 'elasticache_clusters',
+        lambda region, workdir: (region, 'benchmark')
+    ),
+    'fetch_rds_clusters_and_instances_by_vsad': (
+        'Eks.py', 'fetch_rds_clusters_and_instances_by_vsad', 'rds_instances',
+        lambda region, workdir: (region,)
+    ),
+}
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_benchmark(name, sizes, throttle_rate, latency, seed):
+    """
+    Runs one benchmark against a fresh synthetic account. Meant to run in its
+    own process so the peak RSS belongs to this benchmark alone.
+    """
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w') as devnull:
+        # Local caches start empty for every run, so results are repeatable
+        os.environ['CLOUDTRAIL_DB'] = os.path.join(workdir, 'cloudtrail_events.db')
+        os.environ['INVENTORY_DB'] = os.path.join(workdir, 'inventory_history.db')
+        from .client_pool import AWS_REGION, client_hooks
+
+        logging.getLogger('aws.throttle').setLevel(logging.ERROR)
+        sizes = dict(DEFAULT_SIZES, **sizes)
+        account = SyntheticAccount(sizes, throttle_rate, latency, seed)
+        client_hooks.append(account.attach)
+
+        script, function, resource_key, arguments = BENCHMARKS[name]
+        func = load_function(os.path.join(REPO_DIR, script), function)
+        rss_before = _peak_rss_mb()
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(devnull):
+            func(*arguments(AWS_REGION, workdir))
+        wall = time.perf_counter() - started
+
+    return {
+        'benchmark': name,
+        'resources': sizes[resource_key],
+        'wall_seconds': round(wall, 3),
+        'api_calls': account.requests,
+        'throttled': account.throttled,
+        'calls_per_resource': round(account.requests / max(sizes[resource_key], 1), 2),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'rss_growth_mb': round(_peak_rss_mb() - rss_before, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inventory scripts against a synthetic AWS account")
+    parser.add_argument('benchmarks', nargs='*', help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for every account size (default: 1.0)')
+    parser.add_argument('--volumes', type=int, help='Available volumes, overriding --scale (e.g. 100000 for the memory benchmark)')
+    parser.add_argument('--throttle-rate', type=float, default=DEFAULT_THROTTLE_RATE, help='Share of requests answered with a throttling error')
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help='Simulated seconds per request')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the account and throttling')
+    parser.add_argument('--with-budget', action='store_true', help='Keep the host-wide API budget enabled')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+
+    # Children inherit these: dummy credentials so nothing reaches AWS, and
+    # no shared API budget unless asked for, since it would dominate timings
+    os.environ.pop('AWS_PROFILE', None)
+    os.environ.update(AWS_ACCESS_KEY_ID='benchmark', AWS_SECRET_ACCESS_KEY='benchmark', AWS_EC2_METADATA_DISABLED='true')
+    if not args.with_budget:
+        os.environ['AWS_API_BUDGET_DB'] = ''
+
+    sizes = {key: max(1, int(value * args.scale)) for key, value in DEFAULT_SIZES.items()}
+    if args.volumes:
+        sizes['volumes'] = args.volumes
+    results = []
+    for name in args.benchmarks or BENCHMARKS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            result = executor.submit(run_benchmark, name, sizes, args.throttle_rate, args.latency, args.seed).result()
+        results.append(result)
+        print(
+            f"[INFO] {name}: {result['wall_seconds']}s, {result['api_calls']} API calls "
+            f"({result['calls_per_resource']}/resource, {result['throttled']} throttled), "
+            f"peak RSS {result['peak_rss_mb']} MB (+{result['rss_growth_mb']} MB during the run)"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"[DONE] Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+from .api_budget import attach_budget
+from .metrics import attach_metrics
+from .throttle import attach_governors
+
+# Default HTTP connection pool size per client (botocore's own default is 10)
+DEFAULT_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
+AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
+
+# Extra setup applied to every new pooled client after the built-in hooks,
+# e.g. the synthetic account installed by benchmark.py
+client_hooks = []
+
+_lock = threading.Lock()
+_sessions = {}
+_clients = {}
+
+
+def get_boto3_config(region, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS):
+    """
+    Shared botocore configuration for every pooled client.
+    """
+    return Config(
+        region_name=region,
+        retries={'max_attempts': 10, 'mode': 'standard'},
+        max_pool_connections=max_pool_connections
+    )
+
+
+def _get_session(env):
+    # boto3 sessions are not thread-safe, so one session per env is created
+    # once (under the pool lock) and only used to build clients.
+    session = _sessions.get(env)
+    if session is None:
+        session = boto3.Session()
+        _sessions[env] = session
+    return session
+
+
+def get_client(service, region=None, env=None, max_workers=None):
+    """
+    Returns a shared client for (service, region, env), creating it on first use.
+
+    Clients are thread-safe, so the same instance is handed to every worker
+    thread. Pass the worker count as max_workers so the HTTP connection pool
+    is large enough for all of them; a client built with a smaller pool is
+    replaced by a bigger one on demand. Every call goes through the
+    per-operation throttle governor (see throttle.py) and every request is
+    charged against the host-wide API budget (see api_budget.py). Latency,
+    retries, throttles and pages are recorded in metrics.py.
+    """
+    region = region or AWS_REGION
+    pool_size = max(max_workers or 0, DEFAULT_MAX_POOL_CONNECTIONS)
+    key = (service, region, env)
+
+    entry = _clients.get(key)
+    if entry is not None and entry[1] >= pool_size:
+        return entry[0]
+
+    with _lock:
+        entry = _clients.get(key)
+        if entry is not None and entry[1] >= pool_size:
+            return entry[0]
+
+        session = _get_session(env)
+        client = session.client(
+            service,
+            region_name=region,
+            config=get_boto3_config(region, pool_size)
+        )
+        attach_governors(client)
+        attach_budget(client)
+        attach_metrics(client)
+        for hook in client_hooks:
+            hook(client)
+        _clients[key] = (client, pool_size)
+        return client
+
+
+def clear_clients():
+    """
+    Drops every pooled client, e.g. after credentials have been rotated.
+    """
+    with _lock:
+        _clients.clear()
+        _sessions.clear()
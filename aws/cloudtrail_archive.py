@@ -0,0 +1,165 @@
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from .client_pool import AWS_REGION, get_client
+
+# Trail archive to read volume history from instead of LookupEvents: a local
+# directory or s3://bucket/prefix holding the standard AWSLogs layout
+CLOUDTRAIL_ARCHIVE = os.getenv('CLOUDTRAIL_ARCHIVE', '')
+# EBS volume events kept in the timeline
+VOLUME_EVENTS = ('CreateVolume', 'AttachVolume', 'DetachVolume', 'DeleteVolume')
+# Files handed to each worker process at a time
+CHUNK_SIZE = 16
+# Concurrent file reads when no process pool is passed in
+SCAN_WORKERS = 8
+
+# .../AccountID/CloudTrail/region/YYYY/MM/DD/file.json.gz
+LOG_PATH = re.compile(r'/CloudTrail/(?P<region>[^/]+)/(?P<year>\d{4})/(?P<month>\d{2})/(?P<day>\d{2})/[^/]+\.json\.gz$')
+
+
+def _in_range(path, region, start_day, end_day):
+    match = LOG_PATH.search(path)
+    if match is None or (region and match['region'] != region):
+        return False
+    day = (int(match['year']), int(match['month']), int(match['day']))
+    return (start_day is None or day >= start_day) and (end_day is None or day <= end_day)
+
+
+def list_log_files(source, region=None, start=None, end=None):
+    """
+    Yields the trail log files under source (local directory or
+    s3://bucket/prefix) for region and the days between start and end.
+    Files outside the range are skipped by path, without being read.
+    """
+    start_day = (start.year, start.month, start.day) if start else None
+    end_day = (end.year, end.month, end.day) if end else None
+
+    if source.startswith('s3://'):
+        bucket, _, prefix = source[len('s3://'):].partition('/')
+        paginator = get_client('s3').get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if _in_range('/' + obj['Key'], region, start_day, end_day):
+                    yield f"s3://{bucket}/{obj['Key']}"
+        return
+
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if _in_range(path.replace(os.sep, '/'), region, start_day, end_day):
+                yield path
+
+
+def _read_log_file(path):
+    # In a worker process the S3 client is created after the spawn
+    if path.startswith('s3://'):
+        bucket, _, key = path[len('s3://'):].partition('/')
+        body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body']
+        with gzip.GzipFile(fileobj=body) as f:
+            return f.read()
+    with gzip.open(path, 'rb') as f:
+        return f.read()
+
+
+def _scan_file(args):
+    """
+    Worker: returns (volume_id, epoch, event_name, instance_id) for every
+    successful volume event in one log file.
+    """
+    path, event_names, start, end = args
+    data = _read_log_file(path)
+    # Most files hold none of the wanted events; skip them without parsing
+    if not any(f'"{name}"'.encode() in data for name in event_names):
+        return []
+
+    found = []
+    for record in json.loads(data).get('Records', []):
+        if record.get('eventName') not in event_names or record.get('errorCode'):
+            continue
+        event_time = datetime.fromisoformat(record['eventTime'].replace('Z', '+00:00')).timestamp()
+        if (start is not None and event_time < start) or (end is not None and event_time > end):
+            continue
+        request = record.get('requestParameters') or {}
+        response = record.get('responseElements') or {}
+        volume_id = request.get('volumeId') or response.get('volumeId')
+        if volume_id:
+            found.append((volume_id, event_time, record['eventName'], request.get('instanceId')))
+    return found
+
+
+def build_volume_timeline(source, region=None, start=None, end=None, event_names=VOLUME_EVENTS, workers=None,
+                          executor=None):
+    """
+    Reads the trail archive and returns
+    {volume_id: [(event_time, event_name, instance_id), ...]} in time order.
+
+    Files are scanned on a thread pool of `workers` (default SCAN_WORKERS)
+    threads. A process pool can be passed in as executor, but only from a
+    guarded entry point such as main(): spawned workers re-import the
+    caller's __main__, so this function never starts one on its own.
+    """
+    files = list_log_files(source, region, start, end)
+    bounds = (start.timestamp() if start else None, end.timestamp() if end else None)
+    jobs = ((path, tuple(event_names)) + bounds for path in files)
+
+    timeline = {}
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=workers or SCAN_WORKERS) as executor:
+            scanned = list(executor.map(_scan_file, jobs))
+    else:
+        scanned = executor.map(_scan_file, jobs, chunksize=CHUNK_SIZE)
+    for found in scanned:
+        for volume_id, event_time, event_name, instance_id in found:
+            timeline.setdefault(volume_id, []).append((event_time, event_name, instance_id))
+
+    for volume_id, events in timeline.items():
+        events.sort()
+        timeline[volume_id] = [
+            (datetime.fromtimestamp(event_time, timezone.utc), event_name, instance_id)
+            for event_time, event_name, instance_id in events
+        ]
+    return timeline
+
+
+def latest_event_times(timeline, event_name='DetachVolume'):
+    """
+    Returns {volume_id: time of the volume's latest event_name} from a timeline.
+    """
+    latest = {}
+    for volume_id, events in timeline.items():
+        for event_time, name, _ in events:
+            if name == event_name:
+                latest[volume_id] = event_time
+    return latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the EBS attach/detach timeline from archived CloudTrail logs")
+    parser.add_argument('source', help='Local directory or s3://bucket/prefix holding the trail archive')
+    parser.add_argument('--region', default=AWS_REGION, help='AWS region')
+    parser.add_argument('--days', type=int, default=90, help='Days of history to read (default: 90)')
+    parser.add_argument('--workers', type=int, help='Worker threads, or processes with --processes')
+    parser.add_argument('--processes', action='store_true', help='Parse the logs in worker processes')
+    args = parser.parse_args()
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=args.days)
+    if args.processes:
+        # Spawned rather than forked, so no botocore connection or lock is inherited mid-use
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            timeline = build_volume_timeline(args.source, args.region, start, end, executor=executor)
+    else:
+        timeline = build_volume_timeline(args.source, args.region, start, end, workers=args.workers)
+    detached = latest_event_times(timeline)
+    print(f"[INFO] {len(timeline)} volumes with events, {len(detached)} detached at least once")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from .client_pool import get_client
+
+# On-disk cache of CloudTrail events, shared by every run on the host
+CLOUDTRAIL_DB = os.getenv('CLOUDTRAIL_DB', 'cloudtrail_events.db')
+# How far back CloudTrail LookupEvents can see
+LOOKBACK_DAYS = 90
+# Events can show up in LookupEvents several minutes after they happened, so
+# each incremental sync re-reads this much history before the high-water mark
+DELIVERY_LAG = timedelta(minutes=15)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS events ('
+    ' event_id TEXT PRIMARY KEY,'
+    ' region TEXT NOT NULL,'
+    ' event_name TEXT NOT NULL,'
+    ' event_time REAL NOT NULL,'
+    ' username TEXT,'
+    ' resources TEXT'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS events_by_name ON events (region, event_name, event_time)',
+    # One row per (event, resource) so per-resource lookups stay indexed
+    'CREATE TABLE IF NOT EXISTS event_resources ('
+    ' event_id TEXT NOT NULL,'
+    ' region TEXT NOT NULL,'
+    ' event_name TEXT NOT NULL,'
+    ' resource_type TEXT,'
+    ' resource_name TEXT NOT NULL,'
+    ' event_time REAL NOT NULL,'
+    ' PRIMARY KEY (event_id, resource_name)'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS event_resources_by_name'
+    ' ON event_resources (region, event_name, resource_name, event_time)',
+    # Newest EventTime ingested per (region, event name)
+    'CREATE TABLE IF NOT EXISTS high_water_marks ('
+    ' region TEXT NOT NULL,'
+    ' event_name TEXT NOT NULL,'
+    ' event_time REAL NOT NULL,'
+    ' synced_at REAL NOT NULL,'
+    ' PRIMARY KEY (region, event_name)'
+    ') WITHOUT ROWID',
+]
+
+
+class CloudTrailEventStore:
+    """
+    Append-only SQLite cache of CloudTrail events with a high-water mark per
+    (region, event name).
+
+    The first sync of an event name reads the full LookupEvents window
+    (90 days); later syncs only read events newer than the mark (minus a
+    short delivery lag), so a daily run costs a handful of pages. Events are
+    keyed by EventId, so re-reading the overlap never duplicates them.
+    """
+
+    def __init__(self, path=CLOUDTRAIL_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def high_water_mark(self, region, event_name):
+        row = self._connect().execute(
+            'SELECT event_time FROM high_water_marks WHERE region = ? AND event_name = ?',
+            (region, event_name)
+        ).fetchone()
+        return datetime.fromtimestamp(row[0], timezone.utc) if row else None
+
+    def add_events(self, region, events):
+        """
+        Appends events (botocore LookupEvents shape); returns the newest EventTime seen.
+        """
+        newest = None
+        event_rows = []
+        resource_rows = []
+        for event in events:
+            event_time = event['EventTime'].timestamp()
+            newest = event_time if newest is None else max(newest, event_time)
+            resources = event.get('Resources', [])
+            event_rows.append((
+                event['EventId'], region, event['EventName'], event_time,
+                event.get('Username'), json.dumps(resources)
+            ))
+            resource_rows.extend(
+                (event['EventId'], region, event['EventName'], res.get('ResourceType'), res['ResourceName'], event_time)
+                for res in resources if res.get('ResourceName')
+            )
+
+        conn = self._connect()
+        with conn:
+            conn.executemany('INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?)', event_rows)
+            conn.executemany('INSERT OR IGNORE INTO event_resources VALUES (?, ?, ?, ?, ?, ?)', resource_rows)
+        return newest
+
+    def sync(self, region, event_name, cloudtrail=None, days=LOOKBACK_DAYS):
+        """
+        Fetches the events for event_name newer than the high-water mark and
+        appends them. Returns the number of events read from CloudTrail.
+        """
+        cloudtrail = cloudtrail or get_client('cloudtrail', region)
+        end_time = datetime.now(timezone.utc)
+        start_time = end_time - timedelta(days=days)
+        mark = self.high_water_mark(region, event_name)
+        if mark is not None:
+            start_time = max(start_time, mark - DELIVERY_LAG)
+
+        paginator = cloudtrail.get_paginator('lookup_events')
+        page_iterator = paginator.paginate(
+            LookupAttributes=[
+                {'AttributeKey': 'EventName', 'AttributeValue': event_name}
+            ],
+            StartTime=start_time,
+            EndTime=end_time
+        )
+
+        count = 0
+        newest = mark.timestamp() if mark else None
+        for page in page_iterator:
+            page_newest = self.add_events(region, page['Events'])
+            count += len(page['Events'])
+            if page_newest is not None:
+                newest = page_newest if newest is None else max(newest, page_newest)
+
+        # The mark only moves once the whole window has been read, so an
+        # interrupted sync is simply repeated next time.
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO high_water_marks VALUES (?, ?, ?, ?)',
+                (region, event_name, newest if newest is not None else end_time.timestamp(), time.time())
+            )
+        logger.info(f"Synced {count} {event_name} events for {region} since {start_time.isoformat()}")
+        return count
+
+    def latest_by_resource(self, region, event_name, since=None, resource_type=None):
+        """
+        Returns {resource_name: latest event time} for event_name, optionally
+        limited to events at or after `since` and to one resource type.
+        """
+        query = (
+            'SELECT resource_name, MAX(event_time) FROM event_resources'
+            ' WHERE region = ? AND event_name = ? AND event_time >= ?'
+        )
+        args = [region, event_name, since.timestamp() if since else 0]
+        if resource_type:
+            query += ' AND resource_type = ?'
+            args.append(resource_type)
+        query += ' GROUP BY resource_name'
+        return {
+            name: datetime.fromtimestamp(event_time, timezone.utc)
+            for name, event_time in self._connect().execute(query, args)
+        }
+
+    def volume_events(self, region, event_names, since=None):
+        """
+        Yields (volume_id, event_time, event_name, instance_id) for the stored
+        EBS volume events, oldest first; event_time is epoch seconds.
+        """
+        placeholders = ', '.join('?' * len(event_names))
+        rows = self._connect().execute(
+            'SELECT event_name, event_time, resources FROM events'
+            f' WHERE region = ? AND event_name IN ({placeholders}) AND event_time >= ?'
+            ' ORDER BY event_time',
+            [region, *event_names, since.timestamp() if since else 0]
+        )
+        for event_name, event_time, resources in rows:
+            volume_id = instance_id = None
+            for res in json.loads(resources or '[]'):
+                if res.get('ResourceType') == 'AWS::EC2::Volume':
+                    volume_id = res.get('ResourceName')
+                elif res.get('ResourceType') == 'AWS::EC2::Instance':
+                    instance_id = res.get('ResourceName')
+            if volume_id:
+                yield volume_id, event_time, event_name, instance_id
+
+
+# Shared store used by the scripts and apps
+cloudtrail_events = CloudTrailEventStore()
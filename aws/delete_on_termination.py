@@ -0,0 +1,263 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .client_pool import AWS_REGION, get_client
+from .inventory_store import get_vsad
+from .metrics import dump_metrics_at_exit
+from .pipeline import prefetch
+
+# Progress of remediation runs, so an interrupted run picks up where it stopped
+REMEDIATION_DB = os.getenv('REMEDIATION_DB', 'delete_on_termination.db')
+# Concurrent ModifyInstanceAttribute calls
+REMEDIATION_WORKERS = 8
+INSTANCE_PAGE_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    # One row per remediation run; finished_at stays NULL until the run completes
+    'CREATE TABLE IF NOT EXISTS remediation_runs ('
+    ' run_id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' region TEXT NOT NULL,'
+    ' started_at REAL NOT NULL,'
+    ' finished_at REAL'
+    ')',
+    # One row per instance a run has touched
+    'CREATE TABLE IF NOT EXISTS remediated_instances ('
+    ' run_id INTEGER NOT NULL,'
+    ' instance_id TEXT NOT NULL,'
+    ' status TEXT NOT NULL,'
+    ' devices TEXT NOT NULL,'
+    ' message TEXT,'
+    ' updated_at REAL NOT NULL,'
+    ' PRIMARY KEY (run_id, instance_id)'
+    ') WITHOUT ROWID',
+]
+
+
+def stream_delete_on_termination_findings(ec2=None, region=None, states=('running',), include_root=False,
+                                          require_vsad=True):
+    """
+    Yields (instance_id, vsad, [(device_name, volume_id), ...]) for every
+    instance with EBS volumes that are not deleted on termination.
+
+    EC2 filters on instance state, the DeleteOnTermination flag and (with
+    require_vsad) the VSAD tag key, so only candidate instances come back;
+    pages are fetched ahead while earlier ones are checked.
+    """
+    ec2 = ec2 or get_client('ec2', region)
+    filters = [
+        {'Name': 'instance-state-name', 'Values': list(states)},
+        {'Name': 'block-device-mapping.delete-on-termination', 'Values': ['false']},
+    ]
+    if require_vsad:
+        filters.append({'Name': 'tag-key', 'Values': ['VSAD']})
+
+    pages = ec2.get_paginator('describe_instances').paginate(
+        Filters=filters,
+        PaginationConfig={'PageSize': INSTANCE_PAGE_SIZE}
+    )
+    for page in prefetch(pages):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                vsad = get_vsad(instance.get('Tags'))
+                if require_vsad and not vsad:
+                    continue
+                devices = [
+                    (block_device['DeviceName'], block_device['Ebs']['VolumeId'])
+                    for block_device in instance.get('BlockDeviceMappings', [])
+                    if 'Ebs' in block_device
+                    and not block_device['Ebs'].get('DeleteOnTermination', False)
+                    and (include_root or block_device['DeviceName'] != instance.get('RootDeviceName'))
+                ]
+                if devices:
+                    yield instance['InstanceId'], vsad, devices
+
+
+def audit_delete_on_termination(ec2=None, region=None, **kwargs):
+    """
+    Returns {vsad: [{'InstanceId', 'VolumeId', 'DeviceName'}, ...]} for volumes
+    that survive their instance.
+    """
+    results = {}
+    for instance_id, vsad, devices in stream_delete_on_termination_findings(ec2, region, **kwargs):
+        for device_name, volume_id in devices:
+            results.setdefault(vsad, []).append({
+                'InstanceId': instance_id,
+                'VolumeId': volume_id,
+                'DeviceName': device_name
+            })
+    return results
+
+
+def enable_delete_on_termination(ec2, instance_id, device_names):
+    """
+    Sets DeleteOnTermination on the given devices with a single ModifyInstanceAttribute call.
+    """
+    ec2.modify_instance_attribute(
+        InstanceId=instance_id,
+        BlockDeviceMappings=[
+            {'DeviceName': device_name, 'Ebs': {'DeleteOnTermination': True}}
+            for device_name in device_names
+        ]
+    )
+
+
+class RemediationProgress:
+    """
+    SQLite record of what each remediation run has fixed, so a run that is
+    stopped or crashes can be continued (resumed) without redoing them.
+    """
+
+    def __init__(self, path=REMEDIATION_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def start_run(self, region, resume=False):
+        """
+        Returns the run ID to record under: with resume, the region's latest
+        unfinished run if there is one, otherwise a new run.
+        """
+        conn = self._connect()
+        if resume:
+            row = conn.execute(
+                'SELECT run_id FROM remediation_runs WHERE region = ? AND finished_at IS NULL '
+                'ORDER BY run_id DESC LIMIT 1', (region,)
+            ).fetchone()
+            if row:
+                return row[0]
+        cursor = conn.execute(
+            'INSERT INTO remediation_runs (region, started_at) VALUES (?, ?)', (region, time.time())
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        conn = self._connect()
+        conn.execute('UPDATE remediation_runs SET finished_at = ? WHERE run_id = ?', (time.time(), run_id))
+        conn.commit()
+
+    def fixed_devices(self, run_id):
+        """
+        Returns {instance_id: {device_name, ...}} fixed so far by the run.
+        """
+        rows = self._connect().execute(
+            "SELECT instance_id, devices FROM remediated_instances WHERE run_id = ? AND status = 'fixed'", (run_id,)
+        )
+        return {instance_id: set(devices.split(',')) for instance_id, devices in rows}
+
+    def record(self, run_id, instance_id, status, devices, message=None):
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO remediated_instances VALUES (?, ?, ?, ?, ?, ?)',
+            (run_id, instance_id, status, ','.join(devices), message, time.time())
+        )
+        conn.commit()
+
+
+def remediate_delete_on_termination(ec2=None, region=None, workers=REMEDIATION_WORKERS, progress=None,
+                                    dry_run=False, resume=False, **kwargs):
+    """
+    Enables DeleteOnTermination on every finding of the audit.
+
+    Instances are fixed with at most `workers` calls in flight while the
+    audit is still paging, and each outcome is recorded under the run in the
+    progress store. With resume, the last unfinished run is continued and
+    instances it already fixed are skipped, unless they now have other
+    devices without DeleteOnTermination (e.g. a re-attached volume). Returns
+    counts of fixed, failed, skipped and (with dry_run) pending instances.
+    """
+    ec2 = ec2 or get_client('ec2', region, max_workers=workers)
+    region = ec2.meta.region_name
+    progress = progress or RemediationProgress()
+    run_id = None if dry_run else progress.start_run(region, resume)
+    already_fixed = progress.fixed_devices(run_id) if run_id is not None else {}
+    counts = {'fixed': 0, 'failed': 0, 'skipped': 0, 'pending': 0}
+
+    def fix(instance_id, devices):
+        device_names = [device_name for device_name, _ in devices]
+        try:
+            enable_delete_on_termination(ec2, instance_id, device_names)
+            progress.record(run_id, instance_id, 'fixed', device_names)
+            return 'fixed'
+        except (ClientError, BotoCoreError) as e:
+            logger.error(f"Failed to update {instance_id}: {e}")
+            progress.record(run_id, instance_id, 'failed', device_names, str(e))
+            return 'failed'
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for instance_id, vsad, devices in stream_delete_on_termination_findings(ec2, region, **kwargs):
+            if {device_name for device_name, _ in devices} <= already_fixed.get(instance_id, set()):
+                counts['skipped'] += 1
+                continue
+            if dry_run:
+                counts['pending'] += 1
+                print(f"[INFO] Would update {instance_id} ({vsad}): {', '.join(volume for _, volume in devices)}")
+                continue
+            # Keep the queue short so findings are only read as fast as they are fixed
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counts[future.result()] += 1
+            in_flight.add(executor.submit(fix, instance_id, devices))
+        for future in in_flight:
+            counts[future.result()] += 1
+    if run_id is not None:
+        progress.finish_run(run_id)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit and fix EBS volumes that are not deleted on instance termination")
+    parser.add_argument('--region', default=AWS_REGION, help='AWS region')
+    parser.add_argument('--remediate', action='store_true', help='Enable DeleteOnTermination on every finding')
+    parser.add_argument('--dry-run', action='store_true', help='With --remediate, only list what would change')
+    parser.add_argument('--workers', type=int, default=REMEDIATION_WORKERS, help='Concurrent updates')
+    parser.add_argument('--include-root', action='store_true', help='Include root volumes')
+    parser.add_argument('--resume', action='store_true', help='With --remediate, continue the last unfinished run')
+    parser.add_argument('--progress', default=REMEDIATION_DB, help='Progress database for resumable runs')
+    args = parser.parse_args()
+
+    dump_metrics_at_exit()
+    if args.remediate:
+        counts = remediate_delete_on_termination(
+            region=args.region,
+            workers=args.workers,
+            progress=RemediationProgress(args.progress),
+            dry_run=args.dry_run,
+            resume=args.resume,
+            include_root=args.include_root
+        )
+        print(f"[DONE] Fixed: {counts['fixed']}, failed: {counts['failed']}, "
+              f"already fixed: {counts['skipped']}, pending: {counts['pending']}")
+        return
+
+    results = audit_delete_on_termination(region=args.region, include_root=args.include_root)
+    for vsad, volumes in results.items():
+        print(f"\nVSAD: {vsad}")
+        for volume in volumes:
+            print(f"  Instance ID: {volume['InstanceId']}, Volume ID: {volume['VolumeId']}, Device: {volume['DeviceName']}")
+    print(f"\n[DONE] {sum(len(volumes) for volumes in results.values())} volumes without DeleteOnTermination")
+
+
+if __name__ == '__main__':
+    main()
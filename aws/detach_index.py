@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from .client_pool import get_client
+from .cloudtrail_archive import CLOUDTRAIL_ARCHIVE, build_volume_timeline, latest_event_times
+from .cloudtrail_store import LOOKBACK_DAYS, cloudtrail_events
+from .pipeline import prefetch
+
+# How far back the detach index looks
+DETACH_LOOKBACK_DAYS = LOOKBACK_DAYS
+# describe_volumes page size for streamed sweeps (without it, one page holds everything)
+VOLUME_PAGE_SIZE = 500
+
+
+def build_detach_index(cloudtrail=None, region=None, days=DETACH_LOOKBACK_DAYS, store=None, archive=None):
+    """
+    Returns {volume_id: latest detach time} for the DetachVolume events of
+    the last `days`.
+
+    With a trail archive (archive, or CLOUDTRAIL_ARCHIVE) the events are read
+    from the archived log files, which has no rate limit and no 90-day cap.
+    Otherwise they come from the local CloudTrail event store, which is
+    first brought up to date with only the events newer than its high-water
+    mark. Callers join their volumes against the index instead of paging
+    through every DetachVolume event again for each volume.
+    """
+    cloudtrail = cloudtrail or get_client('cloudtrail', region)
+    region = cloudtrail.meta.region_name
+    end_time = datetime.now(timezone.utc)
+    since = end_time - timedelta(days=days)
+
+    archive = archive or CLOUDTRAIL_ARCHIVE
+    if archive:
+        timeline = build_volume_timeline(archive, region, since, end_time, event_names=('DetachVolume',))
+        return latest_event_times(timeline)
+
+    store = store or cloudtrail_events
+    store.sync(region, 'DetachVolume', cloudtrail, days)
+    return store.latest_by_resource(region, 'DetachVolume', since, 'AWS::EC2::Volume')
+
+
+def stream_available_volumes(ec2=None, cloudtrail=None, region=None, days=DETACH_LOOKBACK_DAYS, archive=None):
+    """
+    Yields (volume, last detach time or None) for every available volume.
+
+    The detach index is built in a background thread while describe_volumes
+    pages are fetched ahead through a bounded queue, so volumes start flowing
+    as soon as the index is ready and only a few pages are held in memory at
+    any time.
+    """
+    ec2 = ec2 or get_client('ec2', region)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        index_future = executor.submit(build_detach_index, cloudtrail, region, days, None, archive)
+        pages = ec2.get_paginator('describe_volumes').paginate(
+            Filters=[{'Name': 'status', 'Values': ['available']}],
+            PaginationConfig={'PageSize': VOLUME_PAGE_SIZE}
+        )
+        for page in prefetch(pages):
+            detach_index = index_future.result()
+            for volume in page['Volumes']:
+                yield volume, detach_index.get(volume['VolumeId'])
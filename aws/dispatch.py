@@ -0,0 +1,68 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prometheus_client import Gauge, Histogram
+
+# Worker threads per endpoint unless configured otherwise. Each endpoint gets
+# its own pool, so one slow crawl cannot take every thread from the others.
+DEFAULT_ENDPOINT_WORKERS = int(os.getenv('DISPATCH_ENDPOINT_WORKERS', '4'))
+
+QUEUE_DEPTH = Gauge('dispatch_queue_depth', 'Blocking calls waiting for a worker', ['endpoint'])
+IN_FLIGHT = Gauge('dispatch_in_flight', 'Blocking calls running on a worker', ['endpoint'])
+WAIT_SECONDS = Histogram('dispatch_wait_seconds', 'Time a blocking call waited for a worker', ['endpoint'])
+RUN_SECONDS = Histogram('dispatch_run_seconds', 'Time a blocking call ran on a worker', ['endpoint'])
+
+_endpoint_workers = {}
+_pools = {}
+
+
+def configure_endpoint(endpoint, workers):
+    """
+    Sets the concurrency cap (worker pool size) for an endpoint. Call before
+    the endpoint's first request.
+    """
+    _endpoint_workers[endpoint] = workers
+
+
+def _get_pool(endpoint):
+    pool = _pools.get(endpoint)
+    if pool is None:
+        workers = _endpoint_workers.get(endpoint, DEFAULT_ENDPOINT_WORKERS)
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"dispatch-{endpoint}")
+        _pools[endpoint] = pool
+    return pool
+
+
+async def run_blocking(endpoint, func, *args, **kwargs):
+    """
+    Runs a blocking call (e.g. synchronous boto3) on the endpoint's worker
+    pool and awaits the result, keeping the event loop free for other
+    requests. Requests beyond the endpoint's cap queue up; the queue depth,
+    wait time and run time are exported as Prometheus metrics.
+    """
+    pool = _get_pool(endpoint)
+    queued_at = time.monotonic()
+    started = False
+    QUEUE_DEPTH.labels(endpoint).inc()
+
+    def run():
+        nonlocal started
+        started = True
+        QUEUE_DEPTH.labels(endpoint).dec()
+        WAIT_SECONDS.labels(endpoint).observe(time.monotonic() - queued_at)
+        IN_FLIGHT.labels(endpoint).inc()
+        try:
+            with RUN_SECONDS.labels(endpoint).time():
+                return func(*args, **kwargs)
+        finally:
+            IN_FLIGHT.labels(endpoint).dec()
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, run)
+    except asyncio.CancelledError:
+        # A request cancelled while still queued never reaches run()
+        if not started:
+            QUEUE_DEPTH.labels(endpoint).dec()
+        raise
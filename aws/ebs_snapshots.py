@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .client_pool import get_client
+from .pipeline import prefetch
+from .snapshot import snapshots
+from .volume_record import interned_vsad
+
+# describe_snapshots page size (without one, a single response holds every snapshot)
+SNAPSHOT_PAGE_SIZE = 1000
+# describe_volumes page size for the volume ID index
+VOLUME_PAGE_SIZE = 500
+# Volume ID EBS records on snapshots that were copied or made from an AMI
+PLACEHOLDER_VOLUME_ID = 'vol-ffffffff'
+
+
+def volume_id_index(ec2=None, region=None):
+    """
+    Returns the set of every volume ID in the region, whatever its state.
+    """
+    ec2 = ec2 or get_client('ec2', region)
+    volume_ids = set()
+    pages = ec2.get_paginator('describe_volumes').paginate(PaginationConfig={'PageSize': VOLUME_PAGE_SIZE})
+    for page in prefetch(pages):
+        volume_ids.update(volume['VolumeId'] for volume in page['Volumes'])
+    return volume_ids
+
+
+class SnapshotInventory:
+    """
+    Per-VSAD snapshot totals plus the snapshots whose source volume is gone.
+
+    Only running totals are kept per VSAD (count, GiB, summed age, oldest
+    start time); orphaned snapshots are kept as small tuples of
+    (snapshot_id, volume_id, vsad, GiB, start time).
+    """
+
+    def __init__(self, now=None):
+        self.now = (now or datetime.now(timezone.utc)).timestamp()
+        self.count = 0
+        self.total_gib = 0
+        self.by_vsad = {}
+        self.orphans = []
+
+    def add(self, snapshot, orphaned):
+        vsad = interned_vsad(snapshot.get('Tags'))
+        started = snapshot['StartTime'].timestamp()
+        self.count += 1
+        self.total_gib += snapshot['VolumeSize']
+
+        totals = self.by_vsad.get(vsad)
+        if totals is None:
+            totals = self.by_vsad[vsad] = {'count': 0, 'gib': 0, 'age_days': 0.0, 'oldest': started, 'orphaned': 0}
+        totals['count'] += 1
+        totals['gib'] += snapshot['VolumeSize']
+        totals['age_days'] += (self.now - started) / 86400
+        totals['oldest'] = min(totals['oldest'], started)
+        if orphaned:
+            totals['orphaned'] += 1
+            self.orphans.append((snapshot['SnapshotId'], snapshot['VolumeId'], vsad, snapshot['VolumeSize'], started))
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_gib': self.total_gib,
+            'orphaned': len(self.orphans),
+            'by_vsad': {
+                vsad: {
+                    'count': totals['count'],
+                    'gib': totals['gib'],
+                    'orphaned': totals['orphaned'],
+                    'mean_age_days': round(totals['age_days'] / totals['count'], 1),
+                    'oldest': datetime.fromtimestamp(totals['oldest'], timezone.utc).isoformat(),
+                }
+                for vsad, totals in self.by_vsad.items()
+            },
+        }
+
+    def orphan_rows(self):
+        return [
+            {
+                'SnapshotId': snapshot_id,
+                'VolumeId': volume_id,
+                'VSAD': vsad,
+                'VolumeSize': size,
+                'StartTime': datetime.fromtimestamp(started, timezone.utc).isoformat(),
+            }
+            for snapshot_id, volume_id, vsad, size, started in self.orphans
+        ]
+
+
+def collect_snapshot_inventory(ec2=None, region=None):
+    """
+    Streams the account's own snapshots page by page into a SnapshotInventory.
+
+    The volume ID index is built in a background thread while the first
+    snapshot pages are fetched, and each snapshot is joined against it as
+    it arrives, so orphans are found in the same single pass and no page is
+    held once it has been counted.
+    """
+    ec2 = ec2 or get_client('ec2', region)
+    inventory = SnapshotInventory()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        index_future = executor.submit(volume_id_index, ec2)
+        pages = ec2.get_paginator('describe_snapshots').paginate(
+            OwnerIds=['self'],
+            PaginationConfig={'PageSize': SNAPSHOT_PAGE_SIZE}
+        )
+        for page in prefetch(pages):
+            volume_ids = index_future.result()
+            for snapshot in page['Snapshots']:
+                volume_id = snapshot.get('VolumeId')
+                orphaned = bool(volume_id) and volume_id not in volume_ids and volume_id != PLACEHOLDER_VOLUME_ID
+                inventory.add(snapshot, orphaned)
+    return inventory
+
+
+def _collect_region_inventory(region):
+    return collect_snapshot_inventory(region=region)
+
+
+# One snapshot inventory per region, shared by the snapshot endpoints
+snapshots.register('ebs-snapshots', _collect_region_inventory)
+
+
+def count_snapshots(ec2=None, region=None):
+    """
+    Counts the account's own snapshots page by page without keeping them.
+    """
+    ec2 = ec2 or get_client('ec2', region)
+    pages = ec2.get_paginator('describe_snapshots').paginate(
+        OwnerIds=['self'],
+        PaginationConfig={'PageSize': SNAPSHOT_PAGE_SIZE}
+    )
+    return sum(len(page['Snapshots']) for page in prefetch(pages))
@@ -0,0 +1,218 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from .client_pool import AWS_REGION, get_client
+from .snapshot import snapshots
+from .target_groups import describe_all_load_balancers, describe_all_target_groups
+
+# Concurrent DescribeListeners / DescribeRules / DescribeTargetHealth calls
+TOPOLOGY_WORKERS = 10
+
+
+def _forward_target_groups(actions):
+    """
+    Target group ARNs a list of listener or rule actions forwards to.
+    """
+    arns = []
+    for action in actions or []:
+        if action.get('Type') != 'forward':
+            continue
+        if action.get('TargetGroupArn'):
+            arns.append(action['TargetGroupArn'])
+        for tg in action.get('ForwardConfig', {}).get('TargetGroups', []):
+            arns.append(tg['TargetGroupArn'])
+    return list(dict.fromkeys(arns))
+
+
+class LoadBalancerTopology:
+    """
+    ELBv2 load balancers, listeners, rules, target groups and targets as an
+    adjacency-indexed graph.
+
+    Every edge is kept in both directions (e.g. target group -> targets and
+    instance -> target groups), so the reports that used to crawl the ELB
+    APIs on their own become dictionary lookups over one crawl.
+    """
+
+    def __init__(self):
+        self.load_balancers = {}       # LB ARN -> describe_load_balancers entry
+        self.listeners = {}            # listener ARN -> describe_listeners entry
+        self.rules = {}                # rule ARN -> describe_rules entry
+        self.target_groups = {}        # TG ARN -> describe_target_groups entry
+        self.lb_listeners = {}         # LB ARN -> [listener ARN]
+        self.listener_rules = {}       # listener ARN -> [rule ARN]
+        self.lb_target_groups = {}     # LB ARN -> {TG ARN}
+        self.tg_load_balancers = {}    # TG ARN -> {LB ARN}
+        self.tg_targets = {}           # TG ARN -> [(target ID, port, health state)]
+        self.target_tgs = {}           # target ID -> {TG ARN}
+
+    def add_load_balancer(self, lb):
+        self.load_balancers[lb['LoadBalancerArn']] = lb
+        self.lb_listeners.setdefault(lb['LoadBalancerArn'], [])
+        self.lb_target_groups.setdefault(lb['LoadBalancerArn'], set())
+
+    def add_target_group(self, tg):
+        tg_arn = tg['TargetGroupArn']
+        self.target_groups[tg_arn] = tg
+        self.tg_targets.setdefault(tg_arn, [])
+        self.tg_load_balancers.setdefault(tg_arn, set())
+        for lb_arn in tg.get('LoadBalancerArns', []):
+            if lb_arn in self.load_balancers:
+                self._link(lb_arn, tg_arn)
+
+    def add_listener(self, listener):
+        listener_arn = listener['ListenerArn']
+        self.listeners[listener_arn] = listener
+        self.lb_listeners.setdefault(listener['LoadBalancerArn'], []).append(listener_arn)
+        self.listener_rules.setdefault(listener_arn, [])
+        for tg_arn in _forward_target_groups(listener.get('DefaultActions')):
+            self._link(listener['LoadBalancerArn'], tg_arn)
+
+    def add_rule(self, listener_arn, rule):
+        self.rules[rule['RuleArn']] = rule
+        self.listener_rules.setdefault(listener_arn, []).append(rule['RuleArn'])
+        lb_arn = self.listeners[listener_arn]['LoadBalancerArn']
+        for tg_arn in _forward_target_groups(rule.get('Actions')):
+            self._link(lb_arn, tg_arn)
+
+    def add_targets(self, tg_arn, descriptions):
+        targets = self.tg_targets.setdefault(tg_arn, [])
+        for desc in descriptions:
+            target = desc['Target']
+            targets.append((target['Id'], target.get('Port'), desc.get('TargetHealth', {}).get('State')))
+            self.target_tgs.setdefault(target['Id'], set()).add(tg_arn)
+
+    def _link(self, lb_arn, tg_arn):
+        self.lb_target_groups.setdefault(lb_arn, set()).add(tg_arn)
+        self.tg_load_balancers.setdefault(tg_arn, set()).add(lb_arn)
+
+    def load_balancers_of_type(self, lb_type):
+        return [lb for lb in self.load_balancers.values() if lb['Type'] == lb_type]
+
+    def target_groups_for_target(self, target_id):
+        """
+        Target groups that have target_id (an instance ID, IP or Lambda ARN) registered.
+        """
+        return [self.target_groups[arn] for arn in sorted(self.target_tgs.get(target_id, ()))]
+
+    def load_balancers_for_target(self, target_id):
+        """
+        Load balancers that can route traffic to target_id.
+        """
+        lb_arns = set()
+        for tg_arn in self.target_tgs.get(target_id, ()):
+            lb_arns.update(self.tg_load_balancers.get(tg_arn, ()))
+        return [self.load_balancers[arn] for arn in sorted(lb_arns)]
+
+    def load_balancers_without_healthy_targets(self):
+        """
+        Load balancers none of whose target groups has a healthy target.
+        """
+        return [
+            lb for lb_arn, lb in self.load_balancers.items()
+            if not any(
+                state == 'healthy'
+                for tg_arn in self.lb_target_groups.get(lb_arn, ())
+                for _, _, state in self.tg_targets.get(tg_arn, ())
+            )
+        ]
+
+    def unattached_target_groups(self):
+        """
+        Target groups no existing load balancer routes to.
+        """
+        return [tg for tg_arn, tg in self.target_groups.items() if not self.tg_load_balancers.get(tg_arn)]
+
+    def instances_with_many_ports(self, port_threshold, region=None):
+        """
+        Rows of (instance, target group) pairs where the instance is registered
+        on at least port_threshold ports, in the port report's row format.
+        """
+        results = []
+        for tg_arn, targets in self.tg_targets.items():
+            tg = self.target_groups.get(tg_arn)
+            if tg is None or tg.get('TargetType') != 'instance':
+                continue
+            instance_ports = {}
+            for target_id, port, _ in targets:
+                instance_ports.setdefault(target_id, set()).add(port)
+            for instance_id, ports in instance_ports.items():
+                if len(ports) >= port_threshold:
+                    results.append({
+                        "target_group_name": tg['TargetGroupName'],
+                        "region": region,
+                        "instance_id": instance_id,
+                        "num_ports": len(ports),
+                        "ports": sorted(ports)
+                    })
+        return results
+
+
+def _describe_listeners(elbv2, lb_arn):
+    paginator = elbv2.get_paginator('describe_listeners')
+    return [listener for page in paginator.paginate(LoadBalancerArn=lb_arn) for listener in page['Listeners']]
+
+
+def _describe_rules(elbv2, listener_arn):
+    paginator = elbv2.get_paginator('describe_rules')
+    return [rule for page in paginator.paginate(ListenerArn=listener_arn) for rule in page['Rules']]
+
+
+def _describe_target_health(elbv2, tg_arn):
+    try:
+        return elbv2.describe_target_health(TargetGroupArn=tg_arn)['TargetHealthDescriptions']
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'TargetGroupNotFound':
+            return []
+        raise
+
+
+def build_topology(region=None, with_health=True):
+    """
+    Crawls every load balancer, listener, rule, target group and (with
+    with_health) registered target of the region into a LoadBalancerTopology.
+
+    Load balancers and target groups are paginated listings; listeners,
+    rules and target health are fetched per parent with TOPOLOGY_WORKERS
+    calls in flight. Rules are only read for ALB listeners, the only ones
+    that have rules beyond the default action.
+    """
+    elbv2 = get_client('elbv2', region, max_workers=TOPOLOGY_WORKERS)
+    topology = LoadBalancerTopology()
+    for lb in describe_all_load_balancers(elbv2):
+        topology.add_load_balancer(lb)
+    for tg in describe_all_target_groups(elbv2):
+        topology.add_target_group(tg)
+
+    with ThreadPoolExecutor(max_workers=TOPOLOGY_WORKERS) as executor:
+        lb_arns = list(topology.load_balancers)
+        for listeners in executor.map(lambda arn: _describe_listeners(elbv2, arn), lb_arns):
+            for listener in listeners:
+                topology.add_listener(listener)
+
+        alb_listeners = [
+            arn for arn, listener in topology.listeners.items()
+            if topology.load_balancers[listener['LoadBalancerArn']]['Type'] == 'application'
+        ]
+        for listener_arn, rules in zip(alb_listeners, executor.map(lambda arn: _describe_rules(elbv2, arn), alb_listeners)):
+            for rule in rules:
+                topology.add_rule(listener_arn, rule)
+
+        if with_health:
+            tg_arns = list(topology.target_groups)
+            for tg_arn, descriptions in zip(tg_arns, executor.map(lambda arn: _describe_target_health(elbv2, arn), tg_arns)):
+                topology.add_targets(tg_arn, descriptions)
+    return topology
+
+
+# One topology per region, rebuilt in the background and shared by the reports
+snapshots.register('elb-topology', build_topology)
+
+
+def get_topology(region=None):
+    """
+    Returns the region's LoadBalancerTopology from the shared snapshot.
+    """
+    topology, _ = snapshots.get('elb-topology', region or AWS_REGION)
+    return topology
@@ -0,0 +1,63 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from .client_pool import get_client
+
+# ARNs per DescribeTags call (the API maximum)
+TAGS_PER_CALL = 20
+# Concurrent DescribeTags calls
+TAG_WORKERS = 8
+
+# Errors caused by a resource deleted since it was listed; anything else
+# (throttling, access denied) would fail the halves of the chunk just the same
+MISSING_RESOURCE_ERRORS = ('LoadBalancerNotFound', 'TargetGroupNotFound')
+
+logger = logging.getLogger(__name__)
+
+
+def _describe_chunk(elbv2, arns):
+    try:
+        response = elbv2.describe_tags(ResourceArns=arns)
+        return {desc['ResourceArn']: desc['Tags'] for desc in response['TagDescriptions']}
+    except ClientError as e:
+        if e.response['Error']['Code'] not in MISSING_RESOURCE_ERRORS:
+            raise
+        # One deleted resource fails the whole call; split the chunk so the
+        # others still get their tags
+        if len(arns) == 1:
+            logger.warning(f"Error fetching tags for {arns[0]}: {e}")
+            return {}
+        middle = len(arns) // 2
+        tags = _describe_chunk(elbv2, arns[:middle])
+        tags.update(_describe_chunk(elbv2, arns[middle:]))
+        return tags
+
+
+def describe_tags_bulk(arns, elbv2=None, region=None):
+    """
+    Returns {ARN: [{'Key': ..., 'Value': ...}, ...]} for ELBv2 load balancers
+    and target groups.
+
+    ARNs are sent 20 per DescribeTags call with several calls in flight, so
+    tagging N resources costs N/20 calls. ARNs deleted since they were
+    listed are left out; other errors (throttling, access denied) are raised.
+    """
+    arns = list(dict.fromkeys(arns))
+    if not arns:
+        return {}
+    elbv2 = elbv2 or get_client('elbv2', region, max_workers=TAG_WORKERS)
+    chunks = [arns[i:i + TAGS_PER_CALL] for i in range(0, len(arns), TAGS_PER_CALL)]
+    tags = {}
+    with ThreadPoolExecutor(max_workers=TAG_WORKERS) as executor:
+        for chunk_tags in executor.map(lambda chunk: _describe_chunk(elbv2, chunk), chunks):
+            tags.update(chunk_tags)
+    return tags
+
+
+def tag_value(tags, key, default=None):
+    """
+    Value of key in a boto3 tag list.
+    """
+    return next((tag['Value'] for tag in tags or [] if tag['Key'] == key), default)
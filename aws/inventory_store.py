@@ -0,0 +1,261 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .client_pool import AWS_REGION, get_client
+from .metrics import dump_metrics_at_exit
+
+# On-disk history of every inventory crawl
+INVENTORY_DB = os.getenv('INVENTORY_DB', 'inventory_history.db')
+TAG_THREADS = 10
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    # One row per resource: when it was first and last seen by a crawl
+    'CREATE TABLE IF NOT EXISTS resources ('
+    ' resource_type TEXT NOT NULL,'
+    ' region TEXT NOT NULL,'
+    ' resource_id TEXT NOT NULL,'
+    ' vsad TEXT,'
+    ' detail TEXT,'
+    ' first_seen REAL NOT NULL,'
+    ' last_seen REAL NOT NULL,'
+    ' PRIMARY KEY (resource_type, region, resource_id)'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS resources_first_seen ON resources (resource_type, region, first_seen)',
+    'CREATE INDEX IF NOT EXISTS resources_last_seen ON resources (resource_type, region, last_seen)',
+    'CREATE TABLE IF NOT EXISTS crawls ('
+    ' resource_type TEXT NOT NULL,'
+    ' region TEXT NOT NULL,'
+    ' crawled_at REAL NOT NULL,'
+    ' resource_count INTEGER NOT NULL,'
+    ' PRIMARY KEY (resource_type, region, crawled_at)'
+    ') WITHOUT ROWID',
+]
+
+
+def get_vsad(tags):
+    """
+    VSAD from a boto3 tag list, whatever case the key was written in.
+    """
+    for tag in tags or []:
+        if tag['Key'].lower() == 'vsad':
+            return tag['Value']
+    return None
+
+
+class InventoryStore:
+    """
+    SQLite history of inventory crawls, keyed by resource ID.
+
+    Every crawl upserts the resources it saw: new IDs get first_seen set,
+    known IDs get last_seen moved forward. "New since T" and "gone since T"
+    are then indexed range queries instead of a fresh AWS crawl.
+    """
+
+    def __init__(self, path=INVENTORY_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def record_crawl(self, resource_type, region, rows, crawled_at=None):
+        """
+        Records one complete crawl. rows yields (resource_id, vsad, detail).
+        """
+        crawled_at = crawled_at or time.time()
+        # Finish the AWS crawl before taking the SQLite write lock
+        rows = list(rows)
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT INTO resources (resource_type, region, resource_id, vsad, detail, first_seen, last_seen)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (resource_type, region, resource_id) DO UPDATE SET'
+                ' vsad = excluded.vsad, detail = excluded.detail, last_seen = excluded.last_seen',
+                [
+                    (resource_type, region, resource_id, vsad, detail, crawled_at, crawled_at)
+                    for resource_id, vsad, detail in rows
+                ]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO crawls (resource_type, region, crawled_at, resource_count) VALUES (?, ?, ?, ?)',
+                (resource_type, region, crawled_at, len(rows))
+            )
+        return len(rows)
+
+    def _crawl_time(self, resource_type, region, query, *args):
+        row = self._connect().execute(query, (resource_type, region) + args).fetchone()
+        return row[0] if row else None
+
+    def new_since(self, resource_type, region, since):
+        """
+        Resources first seen at or after `since` (epoch seconds). Resources
+        found by the very first crawl are not reported as new.
+        """
+        first_crawl = self._crawl_time(
+            resource_type, region,
+            'SELECT MIN(crawled_at) FROM crawls WHERE resource_type = ? AND region = ?'
+        )
+        if first_crawl is None:
+            return []
+        rows = self._connect().execute(
+            'SELECT * FROM resources WHERE resource_type = ? AND region = ? AND first_seen >= ? AND first_seen > ?'
+            ' ORDER BY first_seen',
+            (resource_type, region, since, first_crawl)
+        )
+        return [_to_dict(row) for row in rows]
+
+    def gone_since(self, resource_type, region, since):
+        """
+        Resources that existed at the last crawl before `since` (or later) but
+        were missing from the most recent crawl.
+        """
+        latest_crawl = self._crawl_time(
+            resource_type, region,
+            'SELECT MAX(crawled_at) FROM crawls WHERE resource_type = ? AND region = ?'
+        )
+        if latest_crawl is None:
+            return []
+        baseline = self._crawl_time(
+            resource_type, region,
+            'SELECT MAX(crawled_at) FROM crawls WHERE resource_type = ? AND region = ? AND crawled_at <= ?',
+            since
+        )
+        rows = self._connect().execute(
+            'SELECT * FROM resources WHERE resource_type = ? AND region = ? AND last_seen >= ? AND last_seen < ?'
+            ' ORDER BY last_seen',
+            (resource_type, region, baseline if baseline is not None else since, latest_crawl)
+        )
+        return [_to_dict(row) for row in rows]
+
+    def vsad_by_resource(self, resource_type, region):
+        """
+        Returns {resource_id: vsad} for every resource any crawl has seen,
+        including ones that no longer exist.
+        """
+        rows = self._connect().execute(
+            'SELECT resource_id, vsad FROM resources WHERE resource_type = ? AND region = ? AND vsad IS NOT NULL',
+            (resource_type, region)
+        )
+        return {row['resource_id']: row['vsad'] for row in rows}
+
+
+def _to_dict(row):
+    return {
+        'ResourceId': row['resource_id'],
+        'VSAD': row['vsad'],
+        'Detail': row['detail'],
+        'FirstSeen': datetime.fromtimestamp(row['first_seen'], timezone.utc).isoformat(),
+        'LastSeen': datetime.fromtimestamp(row['last_seen'], timezone.utc).isoformat(),
+    }
+
+
+def group_rows_by_vsad(rows):
+    vsad_group = {}
+    for row in rows:
+        vsad = row['VSAD'] or 'Unknown'
+        if vsad not in vsad_group:
+            vsad_group[vsad] = {
+                'count': 0,
+                'instances': []
+            }
+        vsad_group[vsad]['count'] += 1
+        vsad_group[vsad]['instances'].append(row)
+    return vsad_group
+
+
+# Collectors: each yields (resource_id, vsad, detail) for one full crawl
+def ec2_instance_rows(region):
+    paginator = get_client('ec2', region).get_paginator('describe_instances')
+    for page in paginator.paginate():
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                yield instance['InstanceId'], get_vsad(instance.get('Tags')), instance['InstanceType']
+
+
+def ebs_volume_rows(region):
+    paginator = get_client('ec2', region).get_paginator('describe_volumes')
+    for page in paginator.paginate():
+        for volume in page['Volumes']:
+            yield volume['VolumeId'], get_vsad(volume.get('Tags')), f"{volume['VolumeType']}/{volume['Size']}GiB"
+
+
+def rds_instance_rows(region):
+    paginator = get_client('rds', region).get_paginator('describe_db_instances')
+    for page in paginator.paginate():
+        for instance in page['DBInstances']:
+            yield instance['DBInstanceIdentifier'], get_vsad(instance.get('TagList')), instance['DBInstanceClass']
+
+
+def elasticache_cluster_rows(region):
+    client = get_client('elasticache', region, max_workers=TAG_THREADS)
+    clusters = []
+    for page in client.get_paginator('describe_cache_clusters').paginate():
+        clusters.extend(page['CacheClusters'])
+
+    def cluster_row(cluster):
+        tags = client.list_tags_for_resource(ResourceName=cluster['ARN']).get('TagList', [])
+        return cluster['CacheClusterId'], get_vsad(tags), cluster['CacheNodeType']
+
+    with ThreadPoolExecutor(max_workers=TAG_THREADS) as executor:
+        return list(executor.map(cluster_row, clusters))
+
+
+COLLECTORS = {
+    'ec2': ec2_instance_rows,
+    'ebs': ebs_volume_rows,
+    'rds': rds_instance_rows,
+    'elasticache': elasticache_cluster_rows,
+}
+
+
+def crawl_inventory(region, store=None, resource_types=None):
+    """
+    Crawls the given resource types (default: all) and records each crawl.
+    Returns {resource_type: number_of_resources}.
+    """
+    store = store or inventory
+    counts = {}
+    for resource_type in resource_types or COLLECTORS:
+        try:
+            counts[resource_type] = store.record_crawl(resource_type, region, COLLECTORS[resource_type](region))
+        except Exception as e:
+            logger.error(f"Inventory crawl failed for {resource_type} in {region}: {e}")
+    return counts
+
+
+# Shared store used by the FastAPI apps and the crawl job
+inventory = InventoryStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record an inventory crawl into the history store")
+    parser.add_argument('--region', default=AWS_REGION, help='AWS region')
+    parser.add_argument('--types', nargs='*', choices=sorted(COLLECTORS), help='Resource types (default: all)')
+    args = parser.parse_args()
+
+    dump_metrics_at_exit()
+    counts = crawl_inventory(args.region, resource_types=args.types)
+    for resource_type, count in counts.items():
+        print(f"[INFO] {resource_type}: {count} resources recorded")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+from .client_pool import AWS_REGION, get_client
+from .elbv2_tags import TAG_WORKERS, describe_tags_bulk
+from .snapshot import snapshots
+from .target_groups import describe_all_load_balancers
+
+# ELBv2 load balancer types as reported in the Type field
+LOAD_BALANCER_TYPES = ('application', 'network', 'gateway')
+
+
+def collect_load_balancer_inventory(region=None):
+    """
+    Returns {type: {vsad: [{'LoadBalancerName', 'LoadBalancerArn', 'Tags'}, ...]}}
+    for every ALB, NLB and GWLB in the region.
+
+    One paginated describe_load_balancers sweep covers all three types, and
+    the tags of every load balancer are read 20 ARNs per call. Load
+    balancers without a VSAD tag are left out, as in the per-type reports.
+    """
+    elbv2 = get_client('elbv2', region, max_workers=TAG_WORKERS)
+    load_balancers = describe_all_load_balancers(elbv2)
+    tags_by_arn = describe_tags_bulk([lb['LoadBalancerArn'] for lb in load_balancers], elbv2)
+
+    inventory = {lb_type: {} for lb_type in LOAD_BALANCER_TYPES}
+    for lb in load_balancers:
+        lb_arn = lb['LoadBalancerArn']
+        tags = {tag['Key']: tag['Value'] for tag in tags_by_arn.get(lb_arn, [])}
+        vsad = tags.get('VSAD')
+        if not vsad:
+            continue
+        inventory.setdefault(lb['Type'], {}).setdefault(vsad, []).append({
+            'LoadBalancerName': lb['LoadBalancerName'],
+            'LoadBalancerArn': lb_arn,
+            'Tags': tags
+        })
+    return inventory
+
+
+# One snapshot per region serves every load balancer type
+snapshots.register('load-balancers', collect_load_balancer_inventory)
+
+
+def load_balancers_by_vsad(lb_type, region=None, max_age=None):
+    """
+    Returns {vsad: [load balancer, ...]} for one type ('application',
+    'network' or 'gateway') from the shared snapshot, so the ALB, NLB and
+    GWLB reports share a single crawl.
+
+    Apps that call snapshots.start() have it refreshed in the background.
+    Scripts don't run the refresher, so a snapshot older than max_age
+    seconds (default: the refresh interval) is re-crawled here instead.
+    """
+    key = ('load-balancers', region or AWS_REGION)
+    inventory, age = snapshots.get(*key)
+    if age > (snapshots.refresh_seconds if max_age is None else max_age):
+        inventory, _ = snapshots.refresh(key)
+    return inventory.get(lb_type, {})
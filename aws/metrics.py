@@ -0,0 +1,83 @@
+import atexit
+import os
+import time
+
+from botocore import xform_name
+from prometheus_client import REGISTRY, Counter, Histogram, write_to_textfile
+
+from .throttle import is_throttle_error
+
+# Where CLI scripts write their metrics when they exit
+AWS_METRICS_FILE = os.getenv('AWS_METRICS_FILE', 'aws_metrics.prom')
+
+LABELS = ['service', 'operation', 'region']
+
+CALL_SECONDS = Histogram(
+    'aws_call_seconds', 'AWS API call latency, retries and budget waits included', LABELS,
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+CALLS = Counter('aws_calls_total', 'AWS API calls by outcome', LABELS + ['outcome'])
+RETRIES = Counter('aws_retries_total', 'AWS API attempts beyond the first', LABELS)
+THROTTLES = Counter('aws_throttles_total', 'AWS API attempts rejected by throttling', LABELS)
+PAGES = Counter('aws_pages_total', 'Pages fetched from paginated AWS APIs', LABELS)
+
+
+def attach_metrics(client):
+    """
+    Records latency, outcome, retries, throttles and pages for every call
+    made through the client, labelled by (service, operation, region).
+    """
+    service = client.meta.service_model.service_name
+    region = client.meta.region_name
+
+    def before_call(model, context, **kwargs):
+        context['metrics_call'] = (model.name, time.monotonic())
+        context['metrics_attempts'] = 0
+
+    def response_received(parsed_response, context, **kwargs):
+        call = context.get('metrics_call')
+        if call is None:
+            return
+        context['metrics_attempts'] += 1
+        if parsed_response is not None:
+            error_code = parsed_response.get('Error', {}).get('Code')
+            if is_throttle_error(error_code):
+                THROTTLES.labels(service, call[0], region).inc()
+
+    def finish(context, outcome):
+        call = context.pop('metrics_call', None)
+        if call is None:
+            return
+        operation, started = call
+        attempts = context.pop('metrics_attempts', 0)
+        CALL_SECONDS.labels(service, operation, region).observe(time.monotonic() - started)
+        CALLS.labels(service, operation, region, outcome).inc()
+        if attempts > 1:
+            RETRIES.labels(service, operation, region).inc(attempts - 1)
+        # Paginators call the operation once per page
+        if outcome == 'ok' and client.can_paginate(xform_name(operation)):
+            PAGES.labels(service, operation, region).inc()
+
+    def after_call(http_response, context, **kwargs):
+        # Error responses from AWS arrive here too, before the ClientError is raised
+        finish(context, 'ok' if http_response.status_code < 300 else 'error')
+
+    def after_call_error(context, **kwargs):
+        # Connection and timeout errors, after botocore gave up retrying
+        finish(context, 'error')
+
+    events = client.meta.events
+    events.register('before-call', before_call)
+    events.register('response-received', response_received)
+    events.register('after-call', after_call)
+    events.register('after-call-error', after_call_error)
+    return client
+
+
+def dump_metrics_at_exit(path=None):
+    """
+    Writes every collected metric to a Prometheus text file when the script
+    exits (AWS_METRICS_FILE by default), for node_exporter's textfile
+    collector or a quick look after a batch run.
+    """
+    atexit.register(write_to_textfile, path or AWS_METRICS_FILE, REGISTRY)
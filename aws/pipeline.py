@@ -0,0 +1,58 @@
+import queue
+import threading
+
+# Pages buffered between a producer thread and its consumer
+PIPELINE_QUEUE_PAGES = 4
+
+_DONE = object()
+
+
+class _ProducerError:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, max_items=PIPELINE_QUEUE_PAGES):
+    """
+    Iterates `iterable` (e.g. a boto3 page iterator) in a producer thread and
+    yields its items through a bounded queue.
+
+    The next pages are fetched while the consumer works on the current one,
+    and the producer blocks once max_items are waiting, so memory stays
+    bounded however large the account is. Errors in the producer are raised
+    in the consumer; a consumer that stops early stops the producer too.
+    """
+    items = queue.Queue(maxsize=max_items)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(_ProducerError(e))
+            return
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, name='pipeline-producer', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _ProducerError):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+
+# How often each snapshot is re-crawled in the background
+SNAPSHOT_REFRESH_SECONDS = int(os.getenv('SNAPSHOT_REFRESH_SECONDS', '300'))
+# Response header carrying the age of the snapshot an endpoint answered from
+SNAPSHOT_AGE_HEADER = 'X-Snapshot-Age'
+
+logger = logging.getLogger(__name__)
+
+
+class InventorySnapshot:
+    """
+    In-memory inventory kept fresh by a background crawler.
+
+    Each registered service has a fetcher; a snapshot is kept per
+    (service, *args), e.g. ('rds', 'us-east-1'). Endpoints read the
+    snapshot instead of crawling AWS, so dashboard refreshes cost no API
+    calls. The first request for a key crawls once in the foreground; from
+    then on the background thread re-crawls it every refresh_seconds and
+    keeps serving the previous snapshot if a crawl fails (the failed key is
+    retried on the next interval, not in a tight loop).
+    """
+
+    def __init__(self, refresh_seconds=SNAPSHOT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._fetchers = {}
+        self._entries = {}
+        self._tracked = set()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_due = {}
+
+    def register(self, service, fetcher):
+        self._fetchers[service] = fetcher
+
+    def get(self, service, *args):
+        """
+        Returns (data, age_in_seconds) for the snapshot of (service, *args).
+        """
+        key = (service,) + args
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self.refresh(key, only_if_missing=True)
+            self._tracked.add(key)
+        data, refreshed_at = entry
+        return data, time.time() - refreshed_at
+
+    def refresh(self, key, only_if_missing=False):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # One crawl per key at a time; a request that arrives while the
+        # first crawl is running waits for it instead of starting another.
+        with key_lock:
+            entry = self._entries.get(key)
+            if only_if_missing and entry is not None:
+                return entry
+            self._next_due[key] = time.time() + self.refresh_seconds
+            data = self._fetchers[key[0]](*key[1:])
+            entry = (data, time.time())
+            self._entries[key] = entry
+            return entry
+
+    def start(self, *keys):
+        """
+        Starts the background crawler. Keys given here are crawled right away
+        instead of on the first request.
+        """
+        for key in keys:
+            self._tracked.add(key if isinstance(key, tuple) else (key,))
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='inventory-snapshot', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.time()
+            for key in list(self._tracked):
+                if now < self._next_due.get(key, 0):
+                    continue
+                try:
+                    self.refresh(key)
+                except Exception as e:
+                    logger.error(f"Failed to refresh snapshot {key}: {e}")
+            self._stop.wait(1)
+
+
+# Shared snapshot used by the FastAPI apps
+snapshots = InventorySnapshot()
+
+
+def snapshot_response(response, service, *args):
+    """
+    Returns the snapshot for (service, *args) and sets the snapshot age header
+    on the FastAPI response.
+    """
+    data, age = snapshots.get(service, *args)
+    response.headers[SNAPSHOT_AGE_HEADER] = f"{age:.1f}"
+    return data
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from .client_pool import get_client
+
+# describe_target_groups / describe_load_balancers page size (the API maximum)
+ELBV2_PAGE_SIZE = 400
+# Concurrent DescribeTargetHealth calls for candidate groups
+TARGET_HEALTH_WORKERS = 8
+
+
+def describe_all_target_groups(elbv2):
+    paginator = elbv2.get_paginator('describe_target_groups')
+    target_groups = []
+    for page in paginator.paginate(PaginationConfig={'PageSize': ELBV2_PAGE_SIZE}):
+        target_groups.extend(page['TargetGroups'])
+    return target_groups
+
+
+def describe_all_load_balancers(elbv2):
+    paginator = elbv2.get_paginator('describe_load_balancers')
+    load_balancers = []
+    for page in paginator.paginate(PaginationConfig={'PageSize': ELBV2_PAGE_SIZE}):
+        load_balancers.extend(page['LoadBalancers'])
+    return load_balancers
+
+
+def build_attachment_index(elbv2=None, region=None):
+    """
+    Returns (target_groups, {target group ARN: [ARNs of existing load balancers using it]}).
+
+    describe_target_groups already lists the load balancers of every group;
+    checking them against the load balancer listing also catches groups
+    that still point at a load balancer that has been deleted.
+    """
+    elbv2 = elbv2 or get_client('elbv2', region)
+    target_groups = describe_all_target_groups(elbv2)
+    live = {lb['LoadBalancerArn'] for lb in describe_all_load_balancers(elbv2)}
+    index = {
+        tg['TargetGroupArn']: [arn for arn in tg.get('LoadBalancerArns', []) if arn in live]
+        for tg in target_groups
+    }
+    return target_groups, index
+
+
+def _registered_targets(elbv2, tg_arn):
+    try:
+        return len(elbv2.describe_target_health(TargetGroupArn=tg_arn)['TargetHealthDescriptions'])
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'TargetGroupNotFound':
+            # Deleted since it was listed
+            return None
+        raise
+
+
+def find_unattached_target_groups(elbv2=None, region=None, name_filter=None, check_targets=True):
+    """
+    Returns the target groups no existing load balancer uses, as dicts with
+    TargetGroupArn, TargetGroupName, LoadBalancerArns (as listed, possibly
+    stale) and RegisteredTargets.
+
+    The attachment index takes a few paginated calls for the whole account;
+    target health is only described for the unattached candidates (to count
+    their registered targets), not for every group. name_filter, if given,
+    is called with each group and selects the ones to consider.
+    """
+    elbv2 = elbv2 or get_client('elbv2', region, max_workers=TARGET_HEALTH_WORKERS)
+    target_groups, index = build_attachment_index(elbv2)
+    candidates = [
+        tg for tg in target_groups
+        if not index[tg['TargetGroupArn']] and (name_filter is None or name_filter(tg))
+    ]
+
+    counts = [None] * len(candidates)
+    if check_targets and candidates:
+        with ThreadPoolExecutor(max_workers=TARGET_HEALTH_WORKERS) as executor:
+            counts = list(executor.map(lambda tg: _registered_targets(elbv2, tg['TargetGroupArn']), candidates))
+
+    return [
+        {
+            'TargetGroupArn': tg['TargetGroupArn'],
+            'TargetGroupName': tg['TargetGroupName'],
+            'LoadBalancerArns': tg.get('LoadBalancerArns', []),
+            'RegisteredTargets': count,
+        }
+        for tg, count in zip(candidates, counts)
+        if not (check_targets and count is None)
+    ]
@@ -0,0 +1,144 @@
+import logging
+import random
+import threading
+import time
+
+# Error codes AWS services use to signal request throttling
+THROTTLE_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'SlowDown',
+}
+
+# Governor tuning
+INITIAL_CONCURRENCY = 10
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 50
+DECREASE_FACTOR = 0.5
+BASE_COOLDOWN = 1  # seconds
+MAX_COOLDOWN = 30  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+def is_throttle_error(error_code):
+    return error_code in THROTTLE_ERROR_CODES
+
+
+class ThrottleGovernor:
+    """
+    Adaptive concurrency limit for one (service, operation, region).
+
+    Additive increase / multiplicative decrease: every successful call grows
+    the limit by 1/limit (about +1 per round of calls), every throttle halves
+    it and pauses new calls for a short shared cooldown. All workers wait on
+    the same limit and cooldown, so they settle at the rate the account can
+    sustain instead of backing off and retrying in lockstep.
+    """
+
+    def __init__(self, name, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.throttles = 0
+        self._cooldown_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                wait = self._cooldown_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            if self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._condition.notify()
+
+    def on_throttle(self):
+        with self._condition:
+            self.throttles += 1
+            now = time.monotonic()
+            # Throttles from calls that were already in flight when the limit
+            # was cut belong to the same burst; only shrink once per cooldown.
+            if now < self._last_decrease + BASE_COOLDOWN:
+                return
+            self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+            self._last_decrease = now
+            cooldown = min(MAX_COOLDOWN, BASE_COOLDOWN * (self.maximum / self.limit) ** 0.5)
+            self._cooldown_until = now + cooldown * random.uniform(0.5, 1)
+            logger.warning(f"Throttled on {self.name}, concurrency limit lowered to {int(self.limit)}")
+
+
+_lock = threading.Lock()
+_governors = {}
+
+
+def get_governor(service, operation, region):
+    key = (service, operation, region)
+    governor = _governors.get(key)
+    if governor is None:
+        with _lock:
+            governor = _governors.get(key)
+            if governor is None:
+                governor = ThrottleGovernor(f"{service}.{operation} ({region})")
+                _governors[key] = governor
+    return governor
+
+
+def attach_governors(client):
+    """
+    Routes every call made through the client via its operation's governor.
+
+    Hooks into the client's botocore events, so paginators and botocore's own
+    retries are covered too: the slot is taken before the first attempt,
+    every attempt reports success or throttling, and the slot is released
+    once the call has finished or failed.
+    """
+    service = client.meta.service_model.service_name
+    region = client.meta.region_name
+
+    def before_call(model, context, **kwargs):
+        governor = get_governor(service, model.name, region)
+        governor.acquire()
+        context['throttle_governor'] = governor
+
+    def response_received(parsed_response, context, **kwargs):
+        governor = context.get('throttle_governor')
+        if governor is None or parsed_response is None:
+            return
+        error_code = parsed_response.get('Error', {}).get('Code')
+        if is_throttle_error(error_code):
+            governor.on_throttle()
+        elif not error_code:
+            governor.on_success()
+
+    def after_call(context, **kwargs):
+        governor = context.pop('throttle_governor', None)
+        if governor is not None:
+            governor.release()
+
+    events = client.meta.events
+    events.register('before-call', before_call)
+    events.register('response-received', response_received)
+    events.register('after-call', after_call)
+    events.register('after-call-error', after_call)
+    return client
@@ -0,0 +1,172 @@
+import json
+import os
+import time
+
+import numpy as np
+
+# Monthly EBS prices (us-east-1, USD): per GiB, per provisioned IOPS and per
+# MiB/s of throughput above the free baseline. A JSON file with the same
+# shape in EBS_PRICE_TABLE replaces it, e.g. for another region.
+EBS_PRICES = {
+    'gp3': {'gb': 0.08, 'iops': 0.005, 'throughput': 0.04, 'free_iops': 3000, 'free_throughput': 125},
+    'gp2': {'gb': 0.10},
+    'io1': {'gb': 0.125, 'iops': 0.065},
+    'io2': {'gb': 0.125, 'iops': 0.065},
+    'st1': {'gb': 0.045},
+    'sc1': {'gb': 0.015},
+    'standard': {'gb': 0.05},
+}
+EBS_PRICE_TABLE = os.getenv('EBS_PRICE_TABLE', '')
+# Upper edges (days since detach) of the age buckets; the last bucket is open
+AGE_BUCKETS = (7, 30, 90, 180, 365)
+
+SECONDS_PER_DAY = 86400
+
+
+def load_price_table(path=None):
+    """
+    Returns the price table from path (or EBS_PRICE_TABLE), falling back to EBS_PRICES.
+    """
+    path = path or EBS_PRICE_TABLE
+    if not path:
+        return EBS_PRICES
+    with open(path) as f:
+        return json.load(f)
+
+
+def age_bucket_labels(buckets=AGE_BUCKETS):
+    edges = (0,) + tuple(buckets)
+    return [f"{low}-{high}d" for low, high in zip(edges, edges[1:])] + [f"{buckets[-1]}d+"]
+
+
+class VolumeColumns:
+    """
+    Volume records as parallel NumPy arrays, one entry per volume.
+
+    VSADs and volume types are stored as integer codes into `vsads` and
+    `types`, so per-VSAD totals are a single np.bincount instead of a
+    Python loop over every volume.
+    """
+
+    def __init__(self, volume_ids, vsads, vsad_codes, types, type_codes, size, iops, throughput, days_detached):
+        self.volume_ids = volume_ids
+        self.vsads = vsads
+        self.vsad_codes = vsad_codes
+        self.types = types
+        self.type_codes = type_codes
+        self.size = size
+        self.iops = iops
+        self.throughput = throughput
+        self.days_detached = days_detached
+
+    @classmethod
+    def from_records(cls, records, now=None):
+        """
+        Builds the columns from VolumeRecords; volumes never detached count as 0 days.
+        """
+        records = list(records)
+        now = now or time.time()
+        count = len(records)
+        vsads, vsad_codes = np.unique(np.array([r.vsad for r in records], dtype=object).astype(str), return_inverse=True)
+        types, type_codes = np.unique(np.array([r.volume_type for r in records], dtype=object).astype(str), return_inverse=True)
+        detached = np.fromiter((r.last_detached or now for r in records), dtype=np.float64, count=count)
+        return cls(
+            np.array([r.volume_id for r in records], dtype=object),
+            vsads,
+            vsad_codes,
+            types,
+            type_codes,
+            np.fromiter((r.size for r in records), dtype=np.float64, count=count),
+            np.fromiter((r.iops or 0 for r in records), dtype=np.float64, count=count),
+            np.fromiter((r.throughput or 0 for r in records), dtype=np.float64, count=count),
+            np.maximum(now - detached, 0) / SECONDS_PER_DAY
+        )
+
+    def __len__(self):
+        return len(self.volume_ids)
+
+    def monthly_cost(self, prices=None):
+        """
+        Monthly cost of every volume, from a price table keyed by volume type.
+        Types missing from the table are priced at zero.
+        """
+        prices = prices or load_price_table()
+
+        def rate(field):
+            return np.array([prices.get(t, {}).get(field, 0.0) for t in self.types], dtype=np.float64)[self.type_codes]
+
+        billable_iops = np.maximum(self.iops - rate('free_iops'), 0)
+        billable_throughput = np.maximum(self.throughput - rate('free_throughput'), 0)
+        return self.size * rate('gb') + billable_iops * rate('iops') + billable_throughput * rate('throughput')
+
+
+def waste_by_vsad(columns, cost=None):
+    """
+    Returns {vsad: (volume count, GiB, monthly cost)}.
+    """
+    cost = columns.monthly_cost() if cost is None else cost
+    slots = len(columns.vsads)
+    counts = np.bincount(columns.vsad_codes, minlength=slots)
+    gib = np.bincount(columns.vsad_codes, weights=columns.size, minlength=slots)
+    dollars = np.bincount(columns.vsad_codes, weights=cost, minlength=slots)
+    return {
+        vsad: (int(counts[i]), float(gib[i]), float(dollars[i]))
+        for i, vsad in enumerate(columns.vsads)
+    }
+
+
+def age_histograms(columns, buckets=AGE_BUCKETS):
+    """
+    Returns {vsad: [volume count per age bucket]}, buckets as in age_bucket_labels.
+    """
+    bucket_codes = np.digitize(columns.days_detached, buckets, right=True)
+    width = len(buckets) + 1
+    flat = np.bincount(columns.vsad_codes * width + bucket_codes, minlength=len(columns.vsads) * width)
+    grid = flat.reshape(len(columns.vsads), width)
+    return {vsad: grid[i].tolist() for i, vsad in enumerate(columns.vsads)}
+
+
+def top_offenders(columns, n=10, cost=None):
+    """
+    Returns the n volumes with the highest monthly cost as
+    (volume_id, vsad, volume_type, GiB, days detached, monthly cost), most expensive first.
+    """
+    cost = columns.monthly_cost() if cost is None else cost
+    n = min(n, len(cost))
+    if n == 0:
+        return []
+    top = np.argpartition(cost, -n)[-n:]
+    top = top[np.argsort(cost[top])[::-1]]
+    return [
+        (columns.volume_ids[i], columns.vsads[columns.vsad_codes[i]], columns.types[columns.type_codes[i]],
+         float(columns.size[i]), float(columns.days_detached[i]), float(cost[i]))
+        for i in top
+    ]
+
+
+def waste_report(records, prices=None, top_n=10, now=None):
+    """
+    Per-VSAD monthly waste, age histograms and the top offenders for a set of VolumeRecords.
+    """
+    columns = VolumeColumns.from_records(records, now)
+    cost = columns.monthly_cost(prices)
+    return {
+        'total_volumes': len(columns),
+        'total_monthly_cost': float(cost.sum()),
+        'age_buckets': age_bucket_labels(),
+        'by_vsad': waste_by_vsad(columns, cost),
+        'age_histograms': age_histograms(columns),
+        'top_offenders': top_offenders(columns, top_n, cost),
+    }
+
+
+def print_waste_report(report):
+    print(f"\n[INFO] {report['total_volumes']} orphaned volumes, ${report['total_monthly_cost']:,.2f}/month")
+    labels = report['age_buckets']
+    ranked = sorted(report['by_vsad'].items(), key=lambda item: item[1][2], reverse=True)
+    for vsad, (count, gib, dollars) in ranked:
+        ages = ", ".join(f"{label}: {n}" for label, n in zip(labels, report['age_histograms'][vsad]) if n)
+        print(f"  VSAD: {vsad}, Volumes: {count}, GiB: {gib:,.0f}, Monthly: ${dollars:,.2f} ({ages})")
+    print("\nTop offenders:")
+    for volume_id, vsad, volume_type, gib, days, dollars in report['top_offenders']:
+        print(f"  {volume_id} ({vsad}, {volume_type}, {gib:,.0f} GiB, detached {days:.0f}d): ${dollars:,.2f}/month")
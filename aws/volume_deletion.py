@@ -0,0 +1,286 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .client_pool import get_client
+
+# Concurrent DeleteVolume (and DryRun) calls per job; the throttle governor
+# lowers the effective rate further if EC2 starts throttling
+DELETE_WORKERS = 10
+# How long finished jobs stay queryable
+JOB_RETENTION_SECONDS = 3600
+# Job state, shared by every worker process of the API and kept across restarts
+DELETION_JOBS_DB = os.getenv('DELETION_JOBS_DB', 'volume_deletion_jobs.db')
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS deletion_jobs ('
+    ' job_id TEXT PRIMARY KEY,'
+    ' region TEXT,'
+    ' status TEXT NOT NULL,'
+    ' created_at REAL NOT NULL,'
+    ' updated_at REAL NOT NULL,'
+    ' finished_at REAL'
+    ') WITHOUT ROWID',
+    # One row per volume of a job, updated as the job moves it along
+    'CREATE TABLE IF NOT EXISTS deletion_job_volumes ('
+    ' job_id TEXT NOT NULL,'
+    ' volume_id TEXT NOT NULL,'
+    ' status TEXT NOT NULL,'
+    ' message TEXT,'
+    ' code TEXT,'
+    ' PRIMARY KEY (job_id, volume_id)'
+    ') WITHOUT ROWID',
+]
+
+
+def _error_result(e):
+    if isinstance(e, ClientError):
+        return {"status": "failed", "message": e.response['Error']['Message'], "code": e.response['Error']['Code']}
+    if isinstance(e, BotoCoreError):
+        return {"status": "failed", "message": str(e), "code": "BotoCoreError"}
+    return {"status": "failed", "message": str(e), "code": "UnknownError"}
+
+
+def _count_statuses(results):
+    counts = {}
+    for result in results.values():
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return counts
+
+
+class DeletionJobStore:
+    """
+    SQLite record of deletion jobs and their per-volume results, so a job's
+    progress can be read from any worker process and after a restart. A job
+    whose process died keeps its last status; updated_at shows how stale it is.
+    """
+
+    def __init__(self, path=DELETION_JOBS_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def create(self, job):
+        conn = self._connect()
+        conn.execute(
+            'INSERT INTO deletion_jobs VALUES (?, ?, ?, ?, ?, NULL)',
+            (job.job_id, job.region, job.status, job.created_at, job.created_at)
+        )
+        conn.executemany(
+            "INSERT INTO deletion_job_volumes VALUES (?, ?, 'pending', NULL, NULL)",
+            [(job.job_id, vol_id) for vol_id in job.results]
+        )
+        conn.commit()
+
+    def set_status(self, job_id, status, finished_at=None):
+        conn = self._connect()
+        conn.execute(
+            'UPDATE deletion_jobs SET status = ?, updated_at = ?, finished_at = ? WHERE job_id = ?',
+            (status, time.time(), finished_at, job_id)
+        )
+        conn.commit()
+
+    def set_result(self, job_id, vol_id, result):
+        conn = self._connect()
+        conn.execute(
+            'UPDATE deletion_job_volumes SET status = ?, message = ?, code = ? WHERE job_id = ? AND volume_id = ?',
+            (result['status'], result.get('message'), result.get('code'), job_id, vol_id)
+        )
+        conn.execute('UPDATE deletion_jobs SET updated_at = ? WHERE job_id = ?', (time.time(), job_id))
+        conn.commit()
+
+    def progress(self, job_id):
+        """
+        Returns the job's progress in the same shape as VolumeDeletionJob.progress(), or None.
+        """
+        conn = self._connect()
+        job = conn.execute(
+            'SELECT status, updated_at FROM deletion_jobs WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        if job is None:
+            return None
+        results = {}
+        for vol_id, status, message, code in conn.execute(
+            'SELECT volume_id, status, message, code FROM deletion_job_volumes WHERE job_id = ?', (job_id,)
+        ):
+            result = {"status": status}
+            if message is not None:
+                result["message"] = message
+            if code is not None:
+                result["code"] = code
+            results[vol_id] = result
+        return {
+            "job_id": job_id,
+            "status": job[0],
+            "updated_at": job[1],
+            "total": len(results),
+            "counts": _count_statuses(results),
+            "results": results,
+        }
+
+    def prune(self, older_than):
+        """
+        Drops jobs that finished more than older_than seconds ago.
+        """
+        conn = self._connect()
+        cutoff = time.time() - older_than
+        conn.execute(
+            'DELETE FROM deletion_job_volumes WHERE job_id IN '
+            '(SELECT job_id FROM deletion_jobs WHERE finished_at < ?)', (cutoff,)
+        )
+        conn.execute('DELETE FROM deletion_jobs WHERE finished_at < ?', (cutoff,))
+        conn.commit()
+
+
+class VolumeDeletionJob:
+    """
+    Deletes a batch of EBS volumes in the background.
+
+    The whole batch is validated first with DryRun DeleteVolume calls, so
+    volumes that are missing, in use or not permitted are reported before
+    anything is deleted. Volumes that pass are then deleted with at most
+    `workers` calls in flight. Per-volume status moves through
+    pending -> validated -> success / failed, or pending -> invalid. With a
+    store, every change is also written to it.
+    """
+
+    def __init__(self, volume_ids, region=None, workers=DELETE_WORKERS, abort_on_invalid=False, store=None):
+        self.job_id = uuid.uuid4().hex
+        self.region = region
+        self.workers = workers
+        self.abort_on_invalid = abort_on_invalid
+        self.store = store
+        self.status = 'pending'
+        self.created_at = time.time()
+        self.finished_at = None
+        # dict.fromkeys also drops duplicate IDs
+        self.results = {vol_id: {"status": "pending"} for vol_id in dict.fromkeys(volume_ids)}
+        self._lock = threading.Lock()
+        if store is not None:
+            store.create(self)
+
+    def _set(self, vol_id, result):
+        with self._lock:
+            self.results[vol_id] = result
+        if self.store is not None:
+            self.store.set_result(self.job_id, vol_id, result)
+
+    def _set_status(self, status):
+        self.status = status
+        if self.store is not None:
+            self.store.set_status(self.job_id, status, self.finished_at)
+
+    def _validate(self, ec2, vol_id):
+        try:
+            ec2.delete_volume(VolumeId=vol_id, DryRun=True)
+            # A successful DryRun raises DryRunOperation; getting here is unexpected
+            self._set(vol_id, {"status": "validated"})
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'DryRunOperation':
+                self._set(vol_id, {"status": "validated"})
+            else:
+                self._set(vol_id, dict(_error_result(e), status="invalid"))
+        except Exception as e:
+            self._set(vol_id, dict(_error_result(e), status="invalid"))
+
+    def _delete(self, ec2, vol_id):
+        try:
+            ec2.delete_volume(VolumeId=vol_id)
+            self._set(vol_id, {"status": "success", "message": "Volume deleted successfully"})
+        except Exception as e:
+            self._set(vol_id, _error_result(e))
+
+    def run(self):
+        ec2 = get_client('ec2', self.region, max_workers=self.workers)
+        status = 'failed'
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                self._set_status('validating')
+                list(executor.map(lambda vol_id: self._validate(ec2, vol_id), list(self.results)))
+
+                valid = [vol_id for vol_id, result in self.results.items() if result['status'] == 'validated']
+                if self.abort_on_invalid and len(valid) < len(self.results):
+                    status = 'aborted'
+                    return self
+
+                self._set_status('deleting')
+                list(executor.map(lambda vol_id: self._delete(ec2, vol_id), valid))
+            status = 'completed'
+        except Exception as e:
+            logger.error(f"Volume deletion job {self.job_id} failed: {e}")
+        finally:
+            self.finished_at = time.time()
+            self._set_status(status)
+        return self
+
+    def progress(self):
+        with self._lock:
+            results = {vol_id: dict(result) for vol_id, result in self.results.items()}
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": len(results),
+            "counts": _count_statuses(results),
+            "results": results,
+        }
+
+    def legacy_results(self):
+        """
+        Per-volume results in the shape delete_ebs_volumes has always
+        returned: "success" with a message, or "failed" with a message and
+        an error code. Volumes rejected by the DryRun check are "failed"
+        with the code EC2 gave, as a plain DeleteVolume would have been.
+        """
+        results = {}
+        for vol_id, result in self.progress()["results"].items():
+            if result['status'] in ('success', 'failed'):
+                results[vol_id] = result
+            elif result['status'] == 'invalid':
+                results[vol_id] = dict(result, status="failed")
+            else:
+                results[vol_id] = {"status": "failed", "message": f"Volume not deleted (job {self.status})",
+                                   "code": "NotDeleted"}
+        return results
+
+
+# Shared store used by the API and its background jobs
+deletion_jobs = DeletionJobStore()
+
+
+def start_deletion_job(volume_ids, region=None, workers=DELETE_WORKERS, abort_on_invalid=False, store=None):
+    """
+    Starts a deletion job in a background thread and returns it straight
+    away. The job keeps running if the HTTP client that started it goes
+    away, and its progress is recorded in the job store.
+    """
+    store = store or deletion_jobs
+    store.prune(JOB_RETENTION_SECONDS)
+    job = VolumeDeletionJob(volume_ids, region, workers, abort_on_invalid, store)
+    threading.Thread(target=job.run, name=f"delete-volumes-{job.job_id}", daemon=True).start()
+    return job
+
+
+def get_deletion_progress(job_id, store=None):
+    """
+    Returns the progress of a job started by any worker, or None if the job
+    is unknown (or finished longer than JOB_RETENTION_SECONDS ago).
+    """
+    return (store or deletion_jobs).progress(job_id)
@@ -0,0 +1,201 @@
+import argparse
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from .client_pool import AWS_REGION, get_client
+from .cloudtrail_archive import CLOUDTRAIL_ARCHIVE, VOLUME_EVENTS, build_volume_timeline
+from .cloudtrail_store import LOOKBACK_DAYS, cloudtrail_events
+from .inventory_store import inventory
+from .metrics import dump_metrics_at_exit
+
+SECONDS_PER_DAY = 86400
+
+
+class VolumeLifecycleIndex:
+    """
+    Attachment history of every EBS volume as interval arrays.
+
+    Built from one sweep of CreateVolume, AttachVolume, DetachVolume and
+    DeleteVolume events. Each volume's history becomes a list of attached
+    intervals (start, end, instance) and unattached intervals (start, end).
+    The unattached intervals of all volumes are kept in flat NumPy arrays,
+    so "unattached for N days within [T1, T2]" is one vectorized clip over
+    the whole fleet. A volume's state before its first event is inferred
+    from that event (a detach means it was attached) and starts at the
+    beginning of the history window.
+    """
+
+    def __init__(self, events, start, end):
+        self.start = start
+        self.end = end
+        self.created = {}
+        self.deleted = {}
+        # volume_id -> ([attach start, ...], [(start, end, instance_id), ...])
+        self.attachments = {}
+
+        by_volume = {}
+        for volume_id, event_time, event_name, instance_id in events:
+            by_volume.setdefault(volume_id, []).append((event_time, event_name, instance_id))
+
+        self.volume_ids = list(by_volume)
+        gap_volumes, gap_starts, gap_ends = [], [], []
+        for index, volume_id in enumerate(self.volume_ids):
+            attached, unattached = self._intervals(volume_id, sorted(by_volume[volume_id], key=lambda e: e[0]))
+            if attached:
+                self.attachments[volume_id] = ([a[0] for a in attached], attached)
+            for gap_start, gap_end in unattached:
+                gap_volumes.append(index)
+                gap_starts.append(gap_start)
+                gap_ends.append(gap_end)
+
+        self.gap_volumes = np.asarray(gap_volumes, dtype=np.int64)
+        self.gap_starts = np.asarray(gap_starts, dtype=np.float64)
+        self.gap_ends = np.asarray(gap_ends, dtype=np.float64)
+
+    def _intervals(self, volume_id, events):
+        attached, unattached = [], []
+        # Open interval: (start, instance_id) while attached, (start, None) while not
+        state = None
+        for event_time, event_name, instance_id in events:
+            if event_name == 'CreateVolume':
+                self.created[volume_id] = event_time
+                state = ('unattached', event_time, None)
+            elif event_name == 'AttachVolume':
+                if state is None or state[0] == 'unattached':
+                    gap_start = self.start if state is None else state[1]
+                    if event_time > gap_start:
+                        unattached.append((gap_start, event_time))
+                elif state[0] == 'attached':
+                    # The detach was missed; the earlier attachment ended here at the latest
+                    attached.append((state[1], event_time, state[2]))
+                state = ('attached', event_time, instance_id)
+            elif event_name == 'DetachVolume':
+                if state is None or state[0] == 'attached':
+                    attach_start = self.start if state is None else state[1]
+                    attached.append((attach_start, event_time, instance_id or (state[2] if state else None)))
+                state = ('unattached', event_time, None)
+            elif event_name == 'DeleteVolume':
+                self.deleted[volume_id] = event_time
+                if state is not None and state[0] == 'unattached':
+                    unattached.append((state[1], event_time))
+                state = ('deleted', event_time, None)
+
+        if state is not None and state[0] == 'unattached':
+            unattached.append((state[1], self.end))
+        elif state is not None and state[0] == 'attached':
+            attached.append((state[1], self.end, state[2]))
+        return attached, unattached
+
+    def unattached_longer_than(self, days, since=None, until=None):
+        """
+        Returns {volume_id: longest unattached stretch in days} for volumes
+        that stayed unattached for more than `days` in a row within
+        [since, until] (datetimes, default: the whole history window).
+        """
+        low = since.timestamp() if since else self.start
+        high = until.timestamp() if until else self.end
+        spans = np.minimum(self.gap_ends, high) - np.maximum(self.gap_starts, low)
+        mask = spans > days * SECONDS_PER_DAY
+        longest = np.zeros(len(self.volume_ids))
+        np.maximum.at(longest, self.gap_volumes[mask], spans[mask] / SECONDS_PER_DAY)
+        hits = np.flatnonzero(longest)
+        return dict(zip([self.volume_ids[i] for i in hits], longest[hits].tolist()))
+
+    def last_instance(self, volume_id, at=None):
+        """
+        Returns (instance_id, attached at, detached at) for the instance that
+        last held the volume at or before `at` (default: now), or None.
+        """
+        entry = self.attachments.get(volume_id)
+        if entry is None:
+            return None
+        starts, intervals = entry
+        position = bisect_right(starts, at.timestamp() if at else self.end) - 1
+        if position < 0:
+            return None
+        start, end, instance_id = intervals[position]
+        return (
+            instance_id,
+            datetime.fromtimestamp(start, timezone.utc),
+            datetime.fromtimestamp(end, timezone.utc) if end < self.end else None
+        )
+
+    def attribute_vsads(self, volume_ids, instance_vsads):
+        """
+        Returns {volume_id: vsad} for the given volumes, taking each one's
+        VSAD from the last instance that held it (instance_vsads maps
+        instance ID to VSAD, e.g. InventoryStore.vsad_by_resource('ec2', region)).
+        """
+        attributed = {}
+        for volume_id in volume_ids:
+            last = self.last_instance(volume_id)
+            if last and instance_vsads.get(last[0]):
+                attributed[volume_id] = instance_vsads[last[0]]
+        return attributed
+
+
+def build_lifecycle_index(cloudtrail=None, region=None, days=LOOKBACK_DAYS, store=None, archive=None):
+    """
+    Builds the VolumeLifecycleIndex for the last `days`.
+
+    Like the detach index, the events come from the trail archive when one
+    is configured (archive or CLOUDTRAIL_ARCHIVE) and otherwise from the
+    local CloudTrail event store after an incremental sync of each event name.
+    """
+    cloudtrail = cloudtrail or get_client('cloudtrail', region)
+    region = cloudtrail.meta.region_name
+    end_time = datetime.now(timezone.utc)
+    since = end_time - timedelta(days=days)
+
+    archive = archive or CLOUDTRAIL_ARCHIVE
+    if archive:
+        timeline = build_volume_timeline(archive, region, since, end_time)
+        events = (
+            (volume_id, event_time.timestamp(), event_name, instance_id)
+            for volume_id, volume_events in timeline.items()
+            for event_time, event_name, instance_id in volume_events
+        )
+    else:
+        store = store or cloudtrail_events
+        for event_name in VOLUME_EVENTS:
+            store.sync(region, event_name, cloudtrail, days)
+        events = store.volume_events(region, VOLUME_EVENTS, since)
+    return VolumeLifecycleIndex(events, since.timestamp(), end_time.timestamp())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query EBS volume attachment history")
+    parser.add_argument('--region', default=AWS_REGION, help='AWS region')
+    parser.add_argument('--days', type=int, default=LOOKBACK_DAYS, help='Days of history to index (default: 90)')
+    parser.add_argument('--unattached-days', type=float, help='List volumes unattached for longer than this')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Window start for --unattached-days (ISO 8601)')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='Window end for --unattached-days (ISO 8601)')
+    parser.add_argument('--volume', action='append', default=[], help='Show the last instance of this volume')
+    args = parser.parse_args()
+
+    dump_metrics_at_exit()
+    index = build_lifecycle_index(region=args.region, days=args.days)
+    print(f"[INFO] {len(index.volume_ids)} volumes with events in the last {args.days} days")
+
+    if args.unattached_days is not None:
+        since = args.since.replace(tzinfo=args.since.tzinfo or timezone.utc) if args.since else None
+        until = args.until.replace(tzinfo=args.until.tzinfo or timezone.utc) if args.until else None
+        unattached = index.unattached_longer_than(args.unattached_days, since, until)
+        instance_vsads = inventory.vsad_by_resource('ec2', args.region)
+        vsads = index.attribute_vsads(unattached, instance_vsads)
+        for volume_id, days in sorted(unattached.items(), key=lambda item: item[1], reverse=True):
+            print(f"  Volume ID: {volume_id}, Unattached: {days:.1f} days, VSAD (last instance): {vsads.get(volume_id, 'Unknown')}")
+
+    for volume_id in args.volume:
+        last = index.last_instance(volume_id)
+        if last is None:
+            print(f"  Volume ID: {volume_id}, no attachment in the indexed history")
+        else:
+            instance_id, attached, detached = last
+            print(f"  Volume ID: {volume_id}, Instance: {instance_id}, Attached: {attached}, Detached: {detached or 'still attached'}")
+
+
+if __name__ == '__main__':
+    main()
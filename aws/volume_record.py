@@ -0,0 +1,66 @@
+import sys
+from datetime import datetime, timezone
+
+
+def interned_vsad(tags):
+    """
+    VSAD tag value from a boto3 tag list, interned so that every record of
+    the same VSAD shares one string.
+    """
+    for tag in tags or []:
+        if tag['Key'] == 'VSAD':
+            return sys.intern(tag['Value'])
+    return 'Unknown'
+
+
+class VolumeRecord:
+    """
+    The fields of an EBS volume the orphaned-volume reports use.
+
+    A slotted record is a fraction of the size of the boto3 volume dict
+    (which carries attachments, every tag and a dozen other fields), so a
+    sweep of a large account only keeps what it reports. Times are stored
+    as epoch seconds; repeated strings (VSAD, type, AZ) are interned.
+    """
+
+    __slots__ = ('volume_id', 'vsad', 'size', 'volume_type', 'availability_zone', 'create_time', 'last_detached',
+                 'iops', 'throughput')
+
+    def __init__(self, volume_id, vsad, size, volume_type, availability_zone, create_time, last_detached=None,
+                 iops=0, throughput=0):
+        self.volume_id = volume_id
+        self.vsad = vsad
+        self.size = size
+        self.volume_type = volume_type
+        self.availability_zone = availability_zone
+        self.create_time = create_time
+        self.last_detached = last_detached
+        self.iops = iops
+        self.throughput = throughput
+
+    @classmethod
+    def from_volume(cls, volume, last_detached=None):
+        """
+        Builds a record from a describe_volumes entry and an optional detach datetime.
+        """
+        return cls(
+            volume['VolumeId'],
+            interned_vsad(volume.get('Tags')),
+            volume['Size'],
+            sys.intern(volume['VolumeType']),
+            sys.intern(volume['AvailabilityZone']),
+            volume['CreateTime'].timestamp(),
+            last_detached.timestamp() if last_detached else None,
+            volume.get('Iops', 0),
+            volume.get('Throughput', 0)
+        )
+
+    @property
+    def last_detached_at(self):
+        if self.last_detached is None:
+            return None
+        return datetime.fromtimestamp(self.last_detached, timezone.utc)
+
+    @property
+    def created_at(self):
+        return datetime.fromtimestamp(self.create_time, timezone.utc)
@@ -0,0 +1,289 @@
+import argparse
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from .client_pool import AWS_REGION, get_client
+from .metrics import dump_metrics_at_exit
+from .pipeline import prefetch
+from .volume_analytics import VolumeColumns, load_price_table
+from .volume_record import VolumeRecord
+
+# Days of CloudWatch history a recommendation is based on
+RIGHTSIZING_DAYS = 14
+# Metric queries per GetMetricData call (the API maximum)
+METRIC_QUERIES_PER_CALL = 500
+# Concurrent GetMetricData calls
+METRIC_WORKERS = 4
+# One datapoint per hour, holding the busiest minute of that hour
+METRIC_PERIOD = 3600
+# Percentile of the hourly peaks a recommendation has to cover, and the
+# headroom added on top of it
+PEAK_PERCENTILE = 99
+HEADROOM = 1.2
+# gp2 volumes whose burst balance dropped below this were starved of credits
+BURST_STARVED_PERCENT = 20
+# io1/io2 volumes whose peak needs less than this share of the provisioned IOPS
+OVERPROVISIONED_RATIO = 0.5
+
+GP3_BASE_IOPS = 3000
+GP3_MAX_IOPS = 16000
+GP3_IOPS_PER_GIB = 500
+GP3_BASE_THROUGHPUT = 125
+GP3_MAX_THROUGHPUT = 1000
+# gp3 allows at most 0.25 MiB/s of throughput per provisioned IOPS
+GP3_THROUGHPUT_PER_IOPS = 0.25
+IO2_MIN_IOPS = 100
+IO2_MAX_IOPS = 64000
+IO2_IOPS_PER_GIB = 500
+
+# (query name, metric, statistic); EBS publishes these once a minute
+VOLUME_METRICS = (
+    ('read_ops', 'VolumeReadOps', 'Maximum'),
+    ('write_ops', 'VolumeWriteOps', 'Maximum'),
+    ('read_bytes', 'VolumeReadBytes', 'Maximum'),
+    ('write_bytes', 'VolumeWriteBytes', 'Maximum'),
+)
+BURST_METRIC = ('burst', 'BurstBalance', 'Minimum')
+
+
+def collect_rightsizing_candidates(ec2=None, region=None):
+    """
+    Returns VolumeRecords for every gp2, io1 and io2 volume in the region.
+    """
+    ec2 = ec2 or get_client('ec2', region)
+    pages = ec2.get_paginator('describe_volumes').paginate(
+        Filters=[{'Name': 'volume-type', 'Values': ['gp2', 'io1', 'io2']}],
+        PaginationConfig={'PageSize': 500}
+    )
+    return [VolumeRecord.from_volume(volume) for page in prefetch(pages) for volume in page['Volumes']]
+
+
+def _metric_queries(records):
+    """
+    Yields (query id, volume index, query name, MetricDataQuery) for every metric of every volume.
+    """
+    for index, record in enumerate(records):
+        metrics = VOLUME_METRICS + ((BURST_METRIC,) if record.volume_type == 'gp2' else ())
+        for name, metric_name, stat in metrics:
+            yield f"v{index}_{name}", index, name, {
+                'Id': f"v{index}_{name}",
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/EBS',
+                        'MetricName': metric_name,
+                        'Dimensions': [{'Name': 'VolumeId', 'Value': record.volume_id}]
+                    },
+                    'Period': METRIC_PERIOD,
+                    'Stat': stat
+                },
+                'ReturnData': True
+            }
+
+
+def _fetch_batch(cloudwatch, queries, start, end):
+    values = {}
+    paginator = cloudwatch.get_paginator('get_metric_data')
+    for page in paginator.paginate(MetricDataQueries=queries, StartTime=start, EndTime=end, ScanBy='TimestampAscending'):
+        for result in page['MetricDataResults']:
+            times, series = values.setdefault(result['Id'], ([], []))
+            times.extend(timestamp.timestamp() for timestamp in result['Timestamps'])
+            series.extend(result['Values'])
+    return values
+
+
+def fetch_volume_metrics(records, cloudwatch=None, region=None, days=RIGHTSIZING_DAYS):
+    """
+    Returns {volume index: {query name: (np.array of epoch timestamps,
+    np.array of hourly values)}} for records. Hours without data are
+    left out by CloudWatch, so series are only comparable by timestamp.
+
+    Every metric of every volume goes into GetMetricData calls of up to 500
+    queries each (about a hundred volumes per call), a few calls at a time,
+    instead of one GetMetricStatistics call per volume and metric.
+    """
+    cloudwatch = cloudwatch or get_client('cloudwatch', region, max_workers=METRIC_WORKERS)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+
+    queries = list(_metric_queries(records))
+    owners = {query_id: (index, name) for query_id, index, name, _ in queries}
+    batches = [
+        [query for _, _, _, query in queries[i:i + METRIC_QUERIES_PER_CALL]]
+        for i in range(0, len(queries), METRIC_QUERIES_PER_CALL)
+    ]
+
+    metrics = {}
+    with ThreadPoolExecutor(max_workers=METRIC_WORKERS) as executor:
+        for values in executor.map(lambda batch: _fetch_batch(cloudwatch, batch, start, end), batches):
+            for query_id, (times, series) in values.items():
+                index, name = owners[query_id]
+                metrics.setdefault(index, {})[name] = (
+                    np.asarray(times, dtype=np.float64), np.asarray(series, dtype=np.float64)
+                )
+    return metrics
+
+
+def _series(metrics, name):
+    return metrics.get(name, (np.zeros(0), np.zeros(0)))[1]
+
+
+def _sum_aligned(metrics, first, second):
+    """
+    Adds two series point by point on their timestamps; a timestamp missing
+    from one of them counts as 0 there.
+    """
+    (first_times, first_values), (second_times, second_values) = (
+        metrics.get(name, (np.zeros(0), np.zeros(0))) for name in (first, second)
+    )
+    times = np.union1d(first_times, second_times)
+    total = np.zeros(len(times))
+    np.add.at(total, np.searchsorted(times, first_times), first_values)
+    np.add.at(total, np.searchsorted(times, second_times), second_values)
+    return total
+
+
+def _peak(series):
+    return float(np.percentile(series, PEAK_PERCENTILE)) if len(series) else 0.0
+
+
+def _round_up(value, step):
+    return int(math.ceil(value / step) * step)
+
+
+def _gp3_settings(peak_iops, peak_mibps):
+    iops = max(GP3_BASE_IOPS, _round_up(peak_iops * HEADROOM, 100))
+    throughput = max(GP3_BASE_THROUGHPUT, _round_up(peak_mibps * HEADROOM, 5))
+    # Throughput above 125 MiB/s needs enough IOPS behind it
+    iops = max(iops, _round_up(throughput / GP3_THROUGHPUT_PER_IOPS, 100) if throughput > GP3_BASE_THROUGHPUT else 0)
+    return iops, throughput
+
+
+def fit_gp3(size, peak_iops, peak_mibps):
+    """
+    Returns the gp3 (iops, throughput) that covers the peaks plus headroom,
+    or None if the load is beyond what gp3 of this size can provide.
+    """
+    iops, throughput = _gp3_settings(peak_iops, peak_mibps)
+    if iops > min(GP3_MAX_IOPS, GP3_IOPS_PER_GIB * size) or throughput > GP3_MAX_THROUGHPUT:
+        return None
+    return iops, throughput
+
+
+def fit_beyond_gp3(size, peak_iops, peak_mibps):
+    """
+    Returns the (type, size, iops, throughput) for a load gp3 of this size
+    cannot carry: a larger gp3 volume when only the IOPS-per-GiB limit is in
+    the way, otherwise io2 with the IOPS the peak needs (capped at the io2
+    maximum) and the size those IOPS require.
+    """
+    iops, throughput = _gp3_settings(peak_iops, peak_mibps)
+    if iops <= GP3_MAX_IOPS and throughput <= GP3_MAX_THROUGHPUT:
+        return 'gp3', max(size, math.ceil(iops / GP3_IOPS_PER_GIB)), iops, throughput
+    iops = min(IO2_MAX_IOPS, max(IO2_MIN_IOPS, _round_up(peak_iops * HEADROOM, 100)))
+    return 'io2', max(size, math.ceil(iops / IO2_IOPS_PER_GIB)), iops, 0
+
+
+def recommend(records, metrics):
+    """
+    Returns one recommendation dict per record that should change.
+
+    gp2 volumes are all moved (flagged burst_starved when their burst
+    balance ran low): to gp3 of the same size when it can carry the load,
+    otherwise to a larger gp3 or to io2 (see fit_beyond_gp3). io1/io2
+    volumes are flagged when their peak needs less than
+    OVERPROVISIONED_RATIO of the provisioned IOPS, and moved to gp3 when
+    gp3 can carry the load, otherwise to io with fewer IOPS.
+    """
+    recommendations = []
+    proposed = []
+    for index, record in enumerate(records):
+        volume_metrics = metrics.get(index, {})
+        # Per-minute maxima, so per second is /60
+        peak_iops = _peak(_sum_aligned(volume_metrics, 'read_ops', 'write_ops') / 60)
+        peak_mibps = _peak(_sum_aligned(volume_metrics, 'read_bytes', 'write_bytes') / 60 / 2 ** 20)
+        burst = _series(volume_metrics, 'burst')
+        min_burst = float(burst.min()) if len(burst) else None
+
+        fit = fit_gp3(record.size, peak_iops, peak_mibps)
+        if record.volume_type == 'gp2':
+            target = ('gp3', record.size) + fit if fit is not None else fit_beyond_gp3(record.size, peak_iops, peak_mibps)
+            if min_burst is not None and min_burst < BURST_STARVED_PERCENT:
+                reason = 'burst_starved'
+            else:
+                reason = f"gp2_to_{target[0]}"
+        else:
+            if not record.iops or peak_iops * HEADROOM >= record.iops * OVERPROVISIONED_RATIO:
+                continue
+            reason = 'overprovisioned'
+            if fit is not None:
+                target = ('gp3', record.size) + fit
+            else:
+                target = (record.volume_type, record.size, max(IO2_MIN_IOPS, _round_up(peak_iops * HEADROOM, 100)), 0)
+
+        recommendations.append({
+            'VolumeId': record.volume_id,
+            'VSAD': record.vsad,
+            'Reason': reason,
+            'Size': record.size,
+            'CurrentType': record.volume_type,
+            'CurrentIops': record.iops,
+            'PeakIops': round(peak_iops),
+            'PeakThroughputMiBps': round(peak_mibps, 1),
+            'MinBurstBalance': min_burst,
+            'RecommendedType': target[0],
+            'RecommendedSize': target[1],
+            'RecommendedIops': target[2],
+            'RecommendedThroughput': target[3],
+        })
+        proposed.append((record, target))
+
+    # Current and recommended monthly cost, priced column-wise like the waste report
+    if proposed:
+        prices = load_price_table()
+        current = VolumeColumns.from_records([record for record, _ in proposed]).monthly_cost(prices)
+        after = VolumeColumns.from_records([
+            VolumeRecord(record.volume_id, record.vsad, size, volume_type, record.availability_zone,
+                         record.create_time, None, iops, throughput)
+            for record, (volume_type, size, iops, throughput) in proposed
+        ]).monthly_cost(prices)
+        for recommendation, now_cost, new_cost in zip(recommendations, current, after):
+            recommendation['MonthlySavings'] = round(float(now_cost - new_cost), 2)
+    return recommendations
+
+
+def rightsize_volumes(region=None, days=RIGHTSIZING_DAYS):
+    """
+    Returns {vsad: [recommendation, ...]} for the region's gp2, io1 and io2 volumes.
+    """
+    records = collect_rightsizing_candidates(region=region)
+    metrics = fetch_volume_metrics(records, region=region, days=days)
+    by_vsad = {}
+    for recommendation in recommend(records, metrics):
+        by_vsad.setdefault(recommendation['VSAD'], []).append(recommendation)
+    return by_vsad
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend gp3 IOPS and throughput for gp2, io1 and io2 volumes")
+    parser.add_argument('--region', default=AWS_REGION, help='AWS region')
+    parser.add_argument('--days', type=int, default=RIGHTSIZING_DAYS, help='Days of metrics to use (default: 14)')
+    args = parser.parse_args()
+
+    dump_metrics_at_exit()
+    by_vsad = rightsize_volumes(args.region, args.days)
+    for vsad, recommendations in by_vsad.items():
+        savings = sum(r['MonthlySavings'] for r in recommendations)
+        print(f"\nVSAD: {vsad} ({len(recommendations)} volumes, ${savings:,.2f}/month)")
+        for r in recommendations:
+            print(f"  {r['VolumeId']} [{r['Reason']}] {r['CurrentType']} {r['Size']} GiB -> {r['RecommendedType']} "
+                  f"{r['RecommendedSize']} GiB "
+                  f"{r['RecommendedIops']} IOPS / {r['RecommendedThroughput']} MiB/s "
+                  f"(peak {r['PeakIops']} IOPS, {r['PeakThroughputMiBps']} MiB/s)")
+    print(f"\n[DONE] {sum(len(r) for r in by_vsad.values())} volumes to change")
+
+
+if __name__ == '__main__':
+    main()
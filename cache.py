@@ -1,185 +1,88 @@
-import boto3
-import concurrent.futures
-from datetime import datetime, timedelta
+from aws.client_pool import get_client
+from aws.detach_index import stream_available_volumes
+from aws.metrics import dump_metrics_at_exit
+from aws.volume_analytics import print_waste_report, waste_report
+from aws.volume_record import VolumeRecord
 
-# Initialize clients for EC2 and CloudTrail
-ec2 = boto3.client('ec2')
-cloudtrail = boto3.client('cloudtrail')
-
-# Fetch available volumes in parallel
-def fetch_available_volumes():
-    paginator = ec2.get_paginator('describe_volumes')
-    page_iterator = paginator.paginate(
-        Filters=[
-            {'Name': 'status', 'Values': ['available']}
-        ],
-        PaginationConfig={'PageSize': 100}
-    )
-
-    volumes = []
-    for page in page_iterator:
-        for volume in page['Volumes']:
-            volumes.append(volume)
-    return volumes
-
-# Fetch detach time for a volume using CloudTrail
-def get_last_detach_time(volume_id):
-    try:
-        paginator = cloudtrail.get_paginator('lookup_events')
-        page_iterator = paginator.paginate(
-            LookupAttributes=[
-                {'AttributeKey': 'EventName', 'AttributeValue': 'DetachVolume'}
-            ],
-            StartTime=datetime.now() - timedelta(days=90),
-            EndTime=datetime.now()
-        )
-
-        for page in page_iterator:
-            for event in page['Events']:
-                for resource in event['Resources']:
-                    if resource['ResourceType'] == 'AWS::EC2::Volume' and resource['ResourceName'] == volume_id:
-                        return event['EventTime']
-        return None
-    except Exception as e:
-        print(f"Error fetching detach time for volume {volume_id}: {str(e)}")
-        return None
-
-# Organize volumes by VSAD
-def organize_volumes_by_vsad(volumes):
-    vsad_data = {}
-    for volume in volumes:
-        vsad = "Unknown"
-        if 'Tags' in volume:
-            for tag in volume['Tags']:
-                if tag['Key'] == 'VSAD':
-                    vsad = tag['Value']
-                    break
-
-        if vsad not in vsad_data:
-            vsad_data[vsad] = []
-        vsad_data[vsad].append(volume)
-
-    return vsad_data
-
-# Main logic to process volumes and fetch detach times in parallel
+# Shared clients for EC2 and CloudTrail
+ec2 = get_client('ec2')
+cloudtrail = get_client('cloudtrail')
+
+# Main logic to stream volumes and join them with their last detach time
 def process_volumes():
-    volumes = fetch_available_volumes()
-    print(f"Total available volumes: {len(volumes)}")
+    total_volumes = 0
+    results = {}
 
-    # Organize volumes by VSAD
-    vsad_data = organize_volumes_by_vsad(volumes)
+    # describe_volumes pages stream in while the detach index is being built
+    for volume, last_detach_time in stream_available_volumes(ec2, cloudtrail):
+        total_volumes += 1
+        if last_detach_time:
+            # Keep a compact record, not the full boto3 volume dict
+            record = VolumeRecord.from_volume(volume, last_detach_time)
+            if record.vsad not in results:
+                results[record.vsad] = []
+            results[record.vsad].append(record)
 
-    # Fetch detach times in parallel
-    results = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_volume = {executor.submit(get_last_detach_time, vol['VolumeId']): vol for vol in volumes}
-
-        for future in concurrent.futures.as_completed(future_to_volume):
-            volume = future_to_volume[future]
-            try:
-                last_detach_time = future.result()
-                if last_detach_time:
-                    volume['LastDetached'] = last_detach_time
-                    vsad = next((tag['Value'] for tag in volume.get('Tags', []) if tag['Key'] == 'VSAD'), 'Unknown')
-                    if vsad not in results:
-                        results[vsad] = []
-                    results[vsad].append(volume)
-            except Exception as e:
-                print(f"Error processing volume {volume['VolumeId']}: {str(e)}")
+    print(f"Total available volumes: {total_volumes}")
 
     # Display results
-    for vsad, volumes in results.items():
+    for vsad, records in results.items():
         print(f"\nVSAD: {vsad}")
-        for vol in volumes:
-            print(f"  Volume ID: {vol['VolumeId']}, Last Detached: {vol['LastDetached']}")
+        for record in records:
+            print(f"  Volume ID: {record.volume_id}, Last Detached: {record.last_detached_at}")
+
+    # Cost and age per VSAD, computed column-wise over all records at once
+    print_waste_report(waste_report(record for records in results.values() for record in records))
 
 # Run the script
-process_volumes()
+if __name__ == "__main__":
+    dump_metrics_at_exit()
+    process_volumes()
 
 
 
 
 
-import boto3
-import time
-import random
-from datetime import datetime, timedelta
+from aws.client_pool import get_client
+from aws.detach_index import stream_available_volumes
+from aws.metrics import dump_metrics_at_exit
 
-# Initialize clients for EC2 and CloudTrail
-ec2 = boto3.client('ec2')
-cloudtrail = boto3.client('cloudtrail')
-
-# Retry decorator with exponential backoff and jitter
-def retry_with_backoff(func):
-    def wrapper(*args, **kwargs):
-        max_retries = 5  # Maximum number of retries
-        base_delay = 1  # Initial delay in seconds
-
-        for attempt in range(max_retries):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                # If the max retries are reached, raise the exception
-                if attempt == max_retries - 1:
-                    print(f"Max retries reached for {func.__name__}: {str(e)}")
-                    raise
-                else:
-                    # Calculate delay with jitter
-                    delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                    print(f"Retrying {func.__name__} in {delay:.2f} seconds (attempt {attempt + 1})...")
-                    time.sleep(delay)
-    return wrapper
+# Shared clients for EC2 and CloudTrail; throttling is retried by botocore
+# and paced by the per-operation throttle governor
+ec2 = get_client('ec2')
+cloudtrail = get_client('cloudtrail')
 
 # Function to get available volumes with their last detach time and organize by VSAD
-@retry_with_backoff
 def get_volumes_vsad_wise():
     try:
-        # Initialize paginator for describe_volumes
-        paginator = ec2.get_paginator('describe_volumes')
-        
-        # Create a pagination iterator with the required filters
-        page_iterator = paginator.paginate(
-            Filters=[
-                {
-                    'Name': 'status',
-                    'Values': ['available']
-                }
-            ]
-        )
-        
         # Dictionary to store VSAD-wise volume data
         vsad_data = {}
 
-        # Iterate over each page of volumes
-        for page in page_iterator:
-            # Iterate over each volume in the current page
-            for volume in page['Volumes']:
-                volume_id = volume['VolumeId']
-                vsad = "Unknown"
-
-                # Retrieve the VSAD tag, if present
-                if 'Tags' in volume:
-                    for tag in volume['Tags']:
-                        if tag['Key'] == 'VSAD':
-                            vsad = tag['Value']
-                            break
-
-                # Fetch the last detach time using CloudTrail
-                last_detach_time = get_last_detach_time(volume_id)
-
-                # If no detach time is found, skip the volume
-                if not last_detach_time:
-                    continue
-
-                # Organize data by VSAD
-                if vsad not in vsad_data:
-                    vsad_data[vsad] = []
-
-                # Append the volume details to the VSAD entry
-                vsad_data[vsad].append({
-                    'VolumeId': volume_id,
-                    'LastDetached': last_detach_time
-                })
+        # describe_volumes pages stream in while the detach index is being built
+        for volume, last_detach_time in stream_available_volumes(ec2, cloudtrail):
+            volume_id = volume['VolumeId']
+            vsad = "Unknown"
+
+            # Retrieve the VSAD tag, if present
+            if 'Tags' in volume:
+                for tag in volume['Tags']:
+                    if tag['Key'] == 'VSAD':
+                        vsad = tag['Value']
+                        break
+
+            # If no detach time is found, skip the volume
+            if not last_detach_time:
+                continue
+
+            # Organize data by VSAD
+            if vsad not in vsad_data:
+                vsad_data[vsad] = []
+
+            # Append the volume details to the VSAD entry
+            vsad_data[vsad].append({
+                'VolumeId': volume_id,
+                'LastDetached': last_detach_time
+            })
 
         # Print the VSAD-wise organized volume data
         for vsad, volumes in vsad_data.items():
@@ -190,43 +93,10 @@ def get_volumes_vsad_wise():
     except Exception as e:
         print(f"Error: {str(e)}")
 
-# Function to get the last detach time for a volume using CloudTrail
-@retry_with_backoff
-def get_last_detach_time(volume_id):
-    try:
-        # Initialize CloudTrail paginator to search for DetachVolume events
-        paginator = cloudtrail.get_paginator('lookup_events')
-        
-        # Set a filter to search for DetachVolume events for the given volume
-        page_iterator = paginator.paginate(
-            LookupAttributes=[
-                {
-                    'AttributeKey': 'EventName',
-                    'AttributeValue': 'DetachVolume'
-                }
-            ],
-            StartTime=datetime.now() - timedelta(days=90),  # Search last 90 days
-            EndTime=datetime.now()
-        )
-
-        # Iterate over each page of CloudTrail events
-        for page in page_iterator:
-            for event in page['Events']:
-                # Check if the volume ID matches in the event resources
-                for resource in event['Resources']:
-                    if resource['ResourceType'] == 'AWS::EC2::Volume' and resource['ResourceName'] == volume_id:
-                        # Return the event time when the volume was detached
-                        return event['EventTime']
-                        
-        # If no event is found, return None
-        return None
-
-    except Exception as e:
-        print(f"Error fetching detach time for volume {volume_id}: {str(e)}")
-        return None
-
 # Run the function
-get_volumes_vsad_wise()
+if __name__ == "__main__":
+    dump_metrics_at_exit()
+    get_volumes_vsad_wise()
 
 
 
@@ -235,40 +105,20 @@ get_volumes_vsad_wise()
 
 
 
-import boto3
 import logging
-import time
-import random
-from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
+from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from aws.client_pool import get_client
 
 def get_elasticache_clusters(region, cluster_env):
-    session = boto3.Session()
-    aws_boto_config = get_boto3_config(cluster_env, region)
-    elasticache_client = session.client('elasticache', config=aws_boto_config, region_name=region)
-    
-    # Exponential backoff settings
-    max_attempts = 5  # Maximum number of retry attempts
-    base_wait = 1  # Base wait time in seconds
+    # Throttling is retried by botocore and paced by the shared throttle governor
+    elasticache_client = get_client('elasticache', region, cluster_env)
 
     try:
         clusters = []
         paginator = elasticache_client.get_paginator('describe_cache_clusters')
 
-        # Retry mechanism with exponential backoff for getting clusters
-        for attempt in range(1, max_attempts + 1):
-            try:
-                for page in paginator.paginate():
-                    clusters.extend(page['CacheClusters'])
-                break  # Exit the retry loop if successful
-            except ClientError as ex:
-                error_code = ex.response['Error']['Code']
-                if error_code == 'ThrottlingException' or error_code == 'RequestLimitExceeded':
-                    # Calculate wait time with exponential backoff and jitter
-                    wait_time = base_wait * (2 ** attempt) + random.uniform(0, 1)
-                    logging.warning(f"Throttling exception detected. Retrying in {wait_time:.2f} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    raise ex
+        for page in paginator.paginate():
+            clusters.extend(page['CacheClusters'])
 
         # Build detailed cluster data including VSAD level data
         vsad_data = []
@@ -279,22 +129,10 @@ def get_elasticache_clusters(region, cluster_env):
             num_of_cache_nodes = cluster['NumCacheNodes']
             cache_node_type = cluster['CacheNodeType']
 
-            # Retry getting tags with exponential backoff
-            tags_dict = {}
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    tags_response = elasticache_client.list_tags_for_resource(ResourceName=cluster_arn)
-                    tags = tags_response.get('TagList', [])
-                    tags_dict = {tag['Key']: tag['Value'] for tag in tags}
-                    break  # Exit the retry loop if successful
-                except ClientError as ex:
-                    error_code = ex.response['Error']['Code']
-                    if error_code == 'ThrottlingException' or error_code == 'RequestLimitExceeded':
-                        wait_time = base_wait * (2 ** attempt) + random.uniform(0, 1)
-                        logging.warning(f"Throttling exception detected while getting tags. Retrying in {wait_time:.2f} seconds...")
-                        time.sleep(wait_time)
-                    else:
-                        raise ex
+            # Get tags for the cluster
+            tags_response = elasticache_client.list_tags_for_resource(ResourceName=cluster_arn)
+            tags = tags_response.get('TagList', [])
+            tags_dict = {tag['Key']: tag['Value'] for tag in tags}
 
             # Get VSAD value from tags
             vsad = tags_dict.get('VSAD', 'Unknown')
@@ -382,61 +220,30 @@ def group_elasticache_clusters_by_vsad():
 
 
 
-import boto3
 import logging
-import time
-import random
-from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
+from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from aws.client_pool import get_client
 
 def get_elasticache_clusters(region, cluster_env):
-    session = boto3.Session()
-    aws_boto_config = get_boto3_config(cluster_env, region)
-    elasticache_client = session.client('elasticache', config=aws_boto_config, region_name=region)
-    
-    # Exponential backoff settings
-    max_attempts = 5  # Maximum number of retry attempts
-    base_wait = 1  # Base wait time in seconds
+    # Throttling is retried by botocore and paced by the shared throttle governor
+    elasticache_client = get_client('elasticache', region, cluster_env)
     
     try:
         clusters = []
         paginator = elasticache_client.get_paginator('describe_cache_clusters')
 
-        # Retry mechanism with exponential backoff
-        for attempt in range(1, max_attempts + 1):
-            try:
-                for page in paginator.paginate():
-                    clusters.extend(page['CacheClusters'])
-                break  # Exit the retry loop if successful
-            except ClientError as ex:
-                error_code = ex.response['Error']['Code']
-                if error_code == 'ThrottlingException' or error_code == 'RequestLimitExceeded':
-                    # Calculate wait time with exponential backoff and jitter
-                    wait_time = base_wait * (2 ** attempt) + random.uniform(0, 1)
-                    logging.warning(f"Throttling exception detected. Retrying in {wait_time:.2f} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    raise ex
+        for page in paginator.paginate():
+            clusters.extend(page['CacheClusters'])
         
         detailed_clusters = []
         for cluster in clusters:
             cluster_id = cluster['CacheClusterId']
             cluster_arn = cluster['ARN']
             
-            # Retry getting tags with exponential backoff
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    tags_response = elasticache_client.list_tags_for_resource(ResourceName=cluster_arn)
-                    tags = tags_response.get('TagList', [])
-                    tags_dict = {tag['Key']: tag['Value'] for tag in tags}
-                    break  # Exit the retry loop if successful
-                except ClientError as ex:
-                    error_code = ex.response['Error']['Code']
-                    if error_code == 'ThrottlingException' or error_code == 'RequestLimitExceeded':
-                        wait_time = base_wait * (2 ** attempt) + random.uniform(0, 1)
-                        logging.warning(f"Throttling exception detected while getting tags. Retrying in {wait_time:.2f} seconds...")
-                        time.sleep(wait_time)
-                    else:
-                        raise ex
+            # Get tags for the cluster
+            tags_response = elasticache_client.list_tags_for_resource(ResourceName=cluster_arn)
+            tags = tags_response.get('TagList', [])
+            tags_dict = {tag['Key']: tag['Value'] for tag in tags}
             
             # Append detailed cluster info
             detailed_clusters.append({
@@ -1,42 +1,26 @@
-from fastapi import FastAPI, HTTPException
-import boto3
-import asyncio
+from fastapi import FastAPI, HTTPException, Request, Response
+from prometheus_client import make_asgi_app
 import logging
-from threading import Semaphore
+from aws.async_engine import AsyncCollector, ClientDisconnected, run_until_disconnected
 
 # Constants
-CONCURRENT_TAGS = 5  # Max concurrent tag fetches to avoid throttling
-MAX_RETRIES = 5  # Maximum retries for exponential backoff
-semaphore = Semaphore(CONCURRENT_TAGS)  # Semaphore to limit concurrency
+CONCURRENT_REQUESTS = 500  # Max signed ElastiCache requests in flight on the event loop
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 
 # Initialize FastAPI app
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Async function to fetch tags for a cluster
-async def fetch_cluster_tags_async(cluster_arn, elasticache_client):
-    async with semaphore:
-        for attempt in range(MAX_RETRIES):
-            try:
-                response = await asyncio.to_thread(
-                    elasticache_client.list_tags_for_resource, ResourceName=cluster_arn
-                )
-                tags = response.get("TagList", [])
-                return {tag["Key"]: tag["Value"] for tag in tags}
-            except Exception as e:
-                if "Throttling" in str(e) or "Rate exceeded" in str(e):
-                    sleep_time = (2 ** attempt) + (time.time() % 1)
-                    logging.warning(f"Throttling error. Retrying in {sleep_time:.2f} seconds... (Attempt {attempt + 1})")
-                    await asyncio.sleep(sleep_time)
-                else:
-                    logging.error(f"Error fetching tags for {cluster_arn}: {e}")
-                    break
-        raise Exception(f"Max retries exceeded for {cluster_arn}")
+async def fetch_cluster_tags_async(cluster_arn, collector):
+    response = await collector.call("elasticache", "list_tags_for_resource", ResourceName=cluster_arn)
+    tags = response.get("TagList", [])
+    return {tag["Key"]: tag["Value"] for tag in tags}
 
 # Async function to fetch detailed cluster information
-async def fetch_cluster_details_async(cluster, elasticache_client):
+async def fetch_cluster_details_async(cluster, collector):
     try:
         cluster_id = cluster.get("CacheClusterId")
         cluster_arn = cluster.get("ARN")
@@ -45,7 +29,7 @@ async def fetch_cluster_details_async(cluster, elasticache_client):
             return None
 
         # Fetch cluster tags asynchronously
-        tags = await fetch_cluster_tags_async(cluster_arn, elasticache_client)
+        tags = await fetch_cluster_tags_async(cluster_arn, collector)
 
         # Prepare cluster details
         creation_time = cluster.get("CacheClusterCreateTime")
@@ -68,23 +52,19 @@ async def get_elasticache_clusters_async(region):
     """
     Fetches details of all ElastiCache clusters in the specified region using asyncio.
     """
-    session = boto3.Session()
-    aws_boto_config = boto3.session.Config(retries={"max_attempts": 10, "mode": "standard"})
-    elasticache_client = session.client("elasticache", config=aws_boto_config, region_name=region)
-
     try:
-        # Fetch cluster list
-        clusters = []
-        paginator = elasticache_client.get_paginator("describe_cache_clusters")
-        for page in paginator.paginate():
-            clusters.extend(page["CacheClusters"])
-
-        # Fetch cluster details concurrently
-        tasks = [
-            fetch_cluster_details_async(cluster, elasticache_client) for cluster in clusters
-        ]
-        detailed_clusters = await asyncio.gather(*tasks)
-        return [cluster for cluster in detailed_clusters if cluster]
+        async with AsyncCollector(region, concurrency=CONCURRENT_REQUESTS) as collector:
+            # Fetch cluster list
+            clusters = [
+                cluster async for cluster in
+                collector.paginate("elasticache", "describe_cache_clusters", "CacheClusters")
+            ]
+
+            # Fetch cluster details concurrently
+            detailed_clusters = await collector.gather(
+                fetch_cluster_details_async(cluster, collector) for cluster in clusters
+            )
+            return [cluster for cluster in detailed_clusters if cluster]
     except Exception as e:
         logging.error(f"Failed to get ElastiCache clusters: {e}")
         return []
@@ -110,17 +90,21 @@ def aggregate_vsad_data(clusters):
 
 # FastAPI endpoint to fetch ElastiCache clusters
 @app.get("/elasticache/clusters")
-async def get_clusters(region: str):
+async def get_clusters(region: str, request: Request):
     """
-    Endpoint to fetch ElastiCache clusters by region.
+    Endpoint to fetch ElastiCache clusters by region. The crawl is cancelled
+    if the client disconnects before it finishes.
     """
     try:
-        clusters = await get_elasticache_clusters_async(region)
+        clusters = await run_until_disconnected(request, get_elasticache_clusters_async(region))
         if not clusters:
             raise HTTPException(status_code=404, detail="No clusters found")
 
         vsad_summary = aggregate_vsad_data(clusters)
         return vsad_summary
+    except ClientDisconnected:
+        logging.info("Client disconnected, ElastiCache crawl cancelled")
+        return Response(status_code=499)
     except Exception as e:
         logging.error(f"Error fetching clusters: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch ElastiCache clusters")
@@ -131,24 +115,9 @@ async def get_clusters(region: str):
 
 
 
-import asyncio
-
-async def fetch_cluster_tags_async(cluster_arn, elasticache_client):
-    async with semaphore:
-        for attempt in range(MAX_RETRIES):
-            try:
-                response = await asyncio.to_thread(
-                    elasticache_client.list_tags_for_resource, ResourceName=cluster_arn
-                )
-                tags = response.get("TagList", [])
-                return {tag["Key"]: tag["Value"] for tag in tags}
-            except Exception as e:
-                if "Throttling" in str(e) or "Rate exceeded" in str(e):
-                    await asyncio.sleep((2 ** attempt) + (time.time() % 1))
-                else:
-                    logging.error(f"Error fetching tags for {cluster_arn}: {e}")
-                    break
-        raise Exception(f"Max retries exceeded for {cluster_arn}")
+async def fetch_cluster_tags_async(cluster_arn, collector):
+    response = await collector.call("elasticache", "list_tags_for_resource", ResourceName=cluster_arn)
+    return {tag["Key"]: tag["Value"] for tag in response.get("TagList", [])}
 
 
 
@@ -173,56 +142,27 @@ def aggregate_by_vsad(cluster_details):
     return vsad_list
 
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from prometheus_client import make_asgi_app
 from typing import Dict, Any
-import boto3
-import random
-import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from botocore.exceptions import ClientError
+from aws.client_pool import get_client
+from aws.snapshot import snapshots, snapshot_response
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Constants
-MAX_ATTEMPTS = 5
-BASE_DELAY = 1
-MAX_DELAY = 30
 THREADS = 10
 
-def get_boto3_config(cluster_env, region):
-    """
-    Placeholder for custom boto3 configuration based on the environment and region.
-    Modify this to suit your setup.
-    """
-    return boto3.Config(retries={'max_attempts': 10, 'mode': 'standard'})
-
 def fetch_elasticache_clusters(region: str, cluster_env: str) -> Dict[str, Any]:
     """
     Fetches ElastiCache clusters and shard/node details.
     """
-    session = boto3.Session()
-    aws_boto_config = get_boto3_config(cluster_env, region)
-    elasticache_client = session.client('elasticache', config=aws_boto_config, region_name=region)
-
-    def exponential_backoff_retry(func, *args, **kwargs):
-        for attempt in range(1, MAX_ATTEMPTS + 1):
-            try:
-                return func(*args, **kwargs)
-            except ClientError as ex:
-                error_code = ex.response['Error']['Code']
-                if error_code in ['ThrottlingException', 'RequestLimitExceeded']:
-                    wait_time = min(MAX_DELAY, BASE_DELAY * (2 ** attempt) + random.uniform(0, 1))
-                    time.sleep(wait_time)
-                else:
-                    raise ex
-            except Exception as e:
-                if attempt == MAX_ATTEMPTS:
-                    raise e
-        return None
+    elasticache_client = get_client('elasticache', region, cluster_env, max_workers=THREADS)
 
     def get_cluster_tags(cluster_arn):
-        return exponential_backoff_retry(
-            elasticache_client.list_tags_for_resource,
+        return elasticache_client.list_tags_for_resource(
             ResourceName=cluster_arn
         ).get("TagList", [])
 
@@ -244,13 +184,13 @@ def fetch_elasticache_clusters(region: str, cluster_env: str) -> Dict[str, Any]:
         }
 
     def fetch_replication_group_shards():
-        replication_groups = exponential_backoff_retry(elasticache_client.describe_replication_groups).get("ReplicationGroups", [])
+        replication_groups = elasticache_client.describe_replication_groups().get("ReplicationGroups", [])
         total_shards = sum(len(group["NodeGroups"]) for group in replication_groups)
         return total_shards
 
     clusters = []
     paginator = elasticache_client.get_paginator("describe_cache_clusters")
-    for page in exponential_backoff_retry(paginator.paginate):
+    for page in paginator.paginate():
         clusters.extend(page['CacheClusters'])
 
     cluster_details = []
@@ -273,13 +213,20 @@ def fetch_elasticache_clusters(region: str, cluster_env: str) -> Dict[str, Any]:
         }
     }
 
+# Served from a per-(region, env) snapshot refreshed in the background
+snapshots.register('elasticache', fetch_elasticache_clusters)
+
+@app.on_event("startup")
+def start_snapshots():
+    snapshots.start()
+
 @app.get("/elasticache")
-def get_elasticache(region: str, cluster_env: str):
+def get_elasticache(region: str, cluster_env: str, response: Response):
     """
     API endpoint to fetch ElastiCache details.
     """
     try:
-        data = fetch_elasticache_clusters(region, cluster_env)
+        data = snapshot_response(response, 'elasticache', region, cluster_env)
         return data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -291,10 +238,22 @@ def get_elasticache(region: str, cluster_env: str):
 from fastapi import FastAPI, HTTPException
 import boto3
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from prometheus_client import make_asgi_app
+from aws.client_pool import get_client
+from aws.dispatch import run_blocking
 import os
 from collections import defaultdict
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+# Shared clients, so every call is recorded in /metrics
+ec2_client = get_client('ec2')
+rds_client = get_client('rds')
+opensearch_client = get_client('opensearch')
+eks_client = get_client('eks')
+elasticache_client = get_client('elasticache')
+s3_client = get_client('s3')
 
 def get_tag_value(tags, key):
     return next((tag['Value'] for tag in tags if tag['Key'] == key), None)
@@ -311,7 +270,7 @@ def count_by_tg(instances, tag_key='tg'):
 @app.get("/ec2-instance-count-by-tg")
 async def get_ec2_instance_count_by_tg():
     try:
-        response = ec2_client.describe_instances()
+        response = await run_blocking('ec2-instance-count-by-tg', ec2_client.describe_instances)
         instances = [instance for reservation in response['Reservations'] for instance in reservation['Instances']]
         tg_counts = count_by_tg(instances)
         return tg_counts
@@ -325,7 +284,7 @@ async def get_ec2_instance_count_by_tg():
 @app.get("/rds-instance-count-by-tg")
 async def get_rds_instance_count_by_tg():
     try:
-        response = rds_client.describe_db_instances()
+        response = await run_blocking('rds-instance-count-by-tg', rds_client.describe_db_instances)
         instances = response['DBInstances']
         tg_counts = count_by_tg(instances)
         return tg_counts
@@ -339,8 +298,11 @@ async def get_rds_instance_count_by_tg():
 @app.get("/opensearch-domain-count-by-tg")
 async def get_opensearch_domain_count_by_tg():
     try:
-        response = opensearch_client.list_domain_names()
-        instances = [opensearch_client.describe_domain(DomainName=domain['DomainName'])['DomainStatus'] for domain in response['DomainNames']]
+        def describe_domains():
+            response = opensearch_client.list_domain_names()
+            return [opensearch_client.describe_domain(DomainName=domain['DomainName'])['DomainStatus'] for domain in response['DomainNames']]
+
+        instances = await run_blocking('opensearch-domain-count-by-tg', describe_domains)
         tg_counts = count_by_tg(instances)
         return tg_counts
     except NoCredentialsError:
@@ -353,8 +315,11 @@ async def get_opensearch_domain_count_by_tg():
 @app.get("/eks-cluster-count-by-tg")
 async def get_eks_cluster_count_by_tg():
     try:
-        response = eks_client.list_clusters()
-        instances = [{'Tags': eks_client.list_tags_for_resource(resourceArn=arn)['tags']} for arn in response['clusters']]
+        def describe_clusters():
+            response = eks_client.list_clusters()
+            return [{'Tags': eks_client.list_tags_for_resource(resourceArn=arn)['tags']} for arn in response['clusters']]
+
+        instances = await run_blocking('eks-cluster-count-by-tg', describe_clusters)
         tg_counts = count_by_tg(instances)
         return tg_counts
     except NoCredentialsError:
@@ -367,7 +332,7 @@ async def get_eks_cluster_count_by_tg():
 @app.get("/elasticache-cluster-count-by-tg")
 async def get_elasticache_cluster_count_by_tg():
     try:
-        response = elasticache_client.describe_cache_clusters()
+        response = await run_blocking('elasticache-cluster-count-by-tg', elasticache_client.describe_cache_clusters)
         instances = response['CacheClusters']
         tg_counts = count_by_tg(instances)
         return tg_counts
@@ -381,8 +346,11 @@ async def get_elasticache_cluster_count_by_tg():
 @app.get("/s3-bucket-count-by-tg")
 async def get_s3_bucket_count_by_tg():
     try:
-        response = s3_client.list_buckets()
-        instances = [{'Tags': s3_client.get_bucket_tagging(Bucket=bucket['Name'])['TagSet']} for bucket in response['Buckets']]
+        def describe_buckets():
+            response = s3_client.list_buckets()
+            return [{'Tags': s3_client.get_bucket_tagging(Bucket=bucket['Name'])['TagSet']} for bucket in response['Buckets']]
+
+        instances = await run_blocking('s3-bucket-count-by-tg', describe_buckets)
         tg_counts = count_by_tg(instances)
         return tg_counts
     except NoCredentialsError:
@@ -400,20 +368,23 @@ if __name__ == "__main__":
 
 
 from fastapi import FastAPI, HTTPException
+from prometheus_client import make_asgi_app
 import boto3
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from aws.metrics import attach_metrics
 import os
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
 # Configure AWS credentials (can also be done via environment variables or AWS config file)
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = os.getenv('AWS_REGION', 'us-west-2')  # Set your default region
 
-# Create boto3 clients for the required AWS services
-opensearch_client = boto3.client('opensearch', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, region_name=AWS_REGION)
-elasticache_client = boto3.client('elasticache', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, region_name=AWS_REGION)
+# Create boto3 clients for the required AWS services; their calls are recorded in /metrics
+opensearch_client = attach_metrics(boto3.client('opensearch', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, region_name=AWS_REGION))
+elasticache_client = attach_metrics(boto3.client('elasticache', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, region_name=AWS_REGION))
 
 @app.get("/opensearch-domain-count")
 async def get_opensearch_domain_count():
@@ -453,6 +424,7 @@ if __name__ == "__main__":
 
 import boto3
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+from aws.metrics import attach_metrics
 import os
 
 # Configure AWS credentials (can also be done via environment variables or AWS config file)
@@ -460,8 +432,8 @@ AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = os.getenv('AWS_REGION', 'us-west-2')  # Set your default region
 
-# Create boto3 client for CloudWatch
-cloudwatch_client = boto3.client('cloudwatch', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, region_name=AWS_REGION)
+# Create boto3 client for CloudWatch; its calls are recorded in /metrics
+cloudwatch_client = attach_metrics(boto3.client('cloudwatch', aws_access_key_id=AWS_ACCESS_KEY_ID, aws_secret_access_key=AWS_SECRET_ACCESS_KEY, region_name=AWS_REGION))
 
 def get_elasticache_cluster_count():
     try:
@@ -547,53 +519,26 @@ def get_eks_clusters_count_by_vsad():
 
 
 
-import boto3
-import random
-import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
+from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 from fastapi import HTTPException
+from aws.client_pool import get_client
 
 # Constants
-MAX_ATTEMPTS = 5
-BASE_DELAY = 1
-MAX_DELAY = 30
 THREADS = 10  # Number of parallel threads for processing
 
 def fetch_elasticache_clusters(region, cluster_env):
     """
-    Fetches ElastiCache cluster details with retries, exponential backoff, and parallel processing.
+    Fetches ElastiCache cluster details with parallel processing. Throttling is
+    retried by botocore and paced by the shared throttle governor.
     """
-    session = boto3.Session()
-    aws_boto_config = get_boto3_config(cluster_env, region)
-    elasticache_client = session.client('elasticache', config=aws_boto_config, region_name=region)
-
-    def exponential_backoff_retry(func, *args, **kwargs):
-        """
-        Helper function to retry operations with exponential backoff and jitter.
-        """
-        for attempt in range(1, MAX_ATTEMPTS + 1):
-            try:
-                return func(*args, **kwargs)
-            except ClientError as ex:
-                error_code = ex.response['Error']['Code']
-                if error_code in ['ThrottlingException', 'RequestLimitExceeded']:
-                    wait_time = min(MAX_DELAY, BASE_DELAY * (2 ** attempt) + random.uniform(0, 1))
-                    print(f"Retrying in {wait_time:.2f} seconds (Attempt {attempt}) due to throttling...")
-                    time.sleep(wait_time)
-                else:
-                    raise ex
-            except Exception as e:
-                if attempt == MAX_ATTEMPTS:
-                    raise e
-        return None
+    elasticache_client = get_client('elasticache', region, cluster_env, max_workers=THREADS)
 
     def get_cluster_tags(cluster_arn):
         """
         Fetches tags for a given cluster ARN.
         """
-        return exponential_backoff_retry(
-            elasticache_client.list_tags_for_resource,
+        return elasticache_client.list_tags_for_resource(
             ResourceName=cluster_arn
         ).get("TagList", [])
 
@@ -621,14 +566,14 @@ def fetch_elasticache_clusters(region, cluster_env):
         """
         Fetches details for shards and replication groups.
         """
-        replication_groups = exponential_backoff_retry(elasticache_client.describe_replication_groups).get("ReplicationGroups", [])
+        replication_groups = elasticache_client.describe_replication_groups().get("ReplicationGroups", [])
         total_shards = sum(len(group["NodeGroups"]) for group in replication_groups)
         return total_shards
 
     # Fetch cluster data
     clusters = []
     paginator = elasticache_client.get_paginator("describe_cache_clusters")
-    for page in exponential_backoff_retry(paginator.paginate):
+    for page in paginator.paginate():
         clusters.extend(page['CacheClusters'])
 
     # Use threads to process clusters in parallel
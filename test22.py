@@ -1,48 +1,57 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from prometheus_client import make_asgi_app
 from aws.rdsMethods import group_rds_clusters_by_vsad, group_rds_instances_by_vsad
 from aws.mskMethods import group_msk_clusters_by_vsad
 from aws.elasticacheMethods import group_elasticache_clusters_by_vsad
 from aws.opensearchMethods import group_opensearch_domains_by_vsad
+from aws.snapshot import snapshots, snapshot_response
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+# Endpoints answer from in-memory snapshots refreshed in the background
+snapshots.register('rds-clusters', group_rds_clusters_by_vsad)
+snapshots.register('rds-instances', group_rds_instances_by_vsad)
+snapshots.register('msk-clusters', group_msk_clusters_by_vsad)
+snapshots.register('elasticache-clusters', group_elasticache_clusters_by_vsad)
+snapshots.register('opensearch-domains', group_opensearch_domains_by_vsad)
+
+@app.on_event("startup")
+def start_snapshots():
+    snapshots.start('rds-clusters', 'rds-instances', 'msk-clusters', 'elasticache-clusters', 'opensearch-domains')
 
 @app.get("/rds/clusters")
-async def get_rds_clusters_by_vsad():
+def get_rds_clusters_by_vsad(response: Response):
     try:
-        vsad_groups = group_rds_clusters_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'rds-clusters')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/rds/instances")
-async def get_rds_instances_by_vsad():
+def get_rds_instances_by_vsad(response: Response):
     try:
-        vsad_groups = group_rds_instances_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'rds-instances')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/msk/clusters")
-async def get_msk_clusters_by_vsad():
+def get_msk_clusters_by_vsad(response: Response):
     try:
-        vsad_groups = group_msk_clusters_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'msk-clusters')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/elasticache/clusters")
-async def get_elasticache_clusters_by_vsad():
+def get_elasticache_clusters_by_vsad(response: Response):
     try:
-        vsad_groups = group_elasticache_clusters_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'elasticache-clusters')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/opensearch/domains")
-async def get_opensearch_domains_by_vsad():
+def get_opensearch_domains_by_vsad(response: Response):
     try:
-        vsad_groups = group_opensearch_domains_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'opensearch-domains')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -157,51 +166,60 @@ def group_opensearch_domains_by_vsad():
     return group_by_vsad(domains)
 
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from prometheus_client import make_asgi_app
 from aws.rdsMethods import group_rds_clusters_by_vsad, group_rds_instances_by_vsad
 from aws.mskMethods import group_msk_clusters_by_vsad
 from aws.elasticacheMethods import group_elasticache_clusters_by_vsad
 from aws.opensearchMethods import group_opensearch_domains_by_vsad
+from aws.snapshot import snapshots, snapshot_response
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+
+# Endpoints answer from in-memory snapshots refreshed in the background
+snapshots.register('rds-clusters', group_rds_clusters_by_vsad)
+snapshots.register('rds-instances', group_rds_instances_by_vsad)
+snapshots.register('msk-clusters', group_msk_clusters_by_vsad)
+snapshots.register('elasticache-clusters', group_elasticache_clusters_by_vsad)
+snapshots.register('opensearch-domains', group_opensearch_domains_by_vsad)
+
+@app.on_event("startup")
+def start_snapshots():
+    snapshots.start('rds-clusters', 'rds-instances', 'msk-clusters', 'elasticache-clusters', 'opensearch-domains')
 
 @app.get("/rds/clusters")
-async def get_rds_clusters_by_vsad():
+def get_rds_clusters_by_vsad(response: Response):
     try:
-        vsad_groups = group_rds_clusters_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'rds-clusters')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/rds/instances")
-async def get_rds_instances_by_vsad():
+def get_rds_instances_by_vsad(response: Response):
     try:
-        vsad_groups = group_rds_instances_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'rds-instances')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/msk/clusters")
-async def get_msk_clusters_by_vsad():
+def get_msk_clusters_by_vsad(response: Response):
     try:
-        vsad_groups = group_msk_clusters_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'msk-clusters')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/elasticache/clusters")
-async def get_elasticache_clusters_by_vsad():
+def get_elasticache_clusters_by_vsad(response: Response):
     try:
-        vsad_groups = group_elasticache_clusters_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'elasticache-clusters')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/opensearch/domains")
-async def get_opensearch_domains_by_vsad():
+def get_opensearch_domains_by_vsad(response: Response):
     try:
-        vsad_groups = group_opensearch_domains_by_vsad()
-        return vsad_groups
+        return snapshot_response(response, 'opensearch-domains')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -214,17 +232,23 @@ if __name__ == "__main__":
 
 
 from fastapi import FastAPI
-import boto3
+from datetime import datetime, timedelta
+from prometheus_client import make_asgi_app
+from aws.client_pool import get_client
+from aws.dispatch import configure_endpoint, run_blocking
 
 # Initialize FastAPI
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
 
-# Create a Boto3 client for RDS
-rds_client = boto3.client('rds')
+# Each request walks every RDS instance; two at a time is plenty
+configure_endpoint('rds-zero-connections', 2)
 
-@app.get("/rds/zero-connections")
-async def get_zero_connections_rds():
+# Function to find RDS instances with no connections in the last 5 minutes
+def find_zero_connection_instances():
     # Describe all RDS instances
+    rds_client = get_client('rds')
+    cloudwatch_client = get_client('cloudwatch')
     db_instances = rds_client.describe_db_instances()
     zero_connections_list = []
 
@@ -232,7 +256,6 @@ async def get_zero_connections_rds():
         instance_id = instance['DBInstanceIdentifier']
 
         # Get the CloudWatch metrics for database connections
-        cloudwatch_client = boto3.client('cloudwatch')
         response = cloudwatch_client.get_metric_statistics(
             Namespace='AWS/RDS',
             MetricName='DatabaseConnections',
@@ -254,6 +277,11 @@ async def get_zero_connections_rds():
             if average_connections == 0:
                 zero_connections_list.append(instance_id)
 
+    return zero_connections_list
+
+@app.get("/rds/zero-connections")
+async def get_zero_connections_rds():
+    zero_connections_list = await run_blocking('rds-zero-connections', find_zero_connection_instances)
     return {"zero_connection_instances": zero_connections_list}
 
 